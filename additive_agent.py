@@ -1,5 +1,7 @@
 from google import genai
 from google.genai import types
+from model_router import generate_json
+from schemas import AdditiveVerdict
 import json
 
 # SETUP
@@ -30,21 +32,19 @@ OUTPUT FORMAT (JSON):
 }
 """
 
-def run_additive_agent(normalized_data):
+def run_additive_agent(normalized_data, deadline=None, tier="standard"):
     print(f"   [+ Swarm] 🧪 Additive Agent analyzing...")
     
     prompt = f"ANALYZE INGREDIENTS: {json.dumps(normalized_data)}"
     
     try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                response_mime_type="application/json",
-                temperature=0.0
-            )
+        config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            response_mime_type="application/json",
+            response_schema=AdditiveVerdict,
+            max_output_tokens=512,
+            temperature=0.0
         )
-        return json.loads(response.text)
+        return generate_json(client, "additive", prompt, config, tier, deadline)
     except Exception as e:
         return {"verdict": "ERROR", "reasoning": str(e)}
\ No newline at end of file
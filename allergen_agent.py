@@ -1,5 +1,7 @@
 from google import genai
 from google.genai import types
+from model_router import generate_json
+from schemas import AllergenVerdict
 import json
 
 # SETUP
@@ -34,21 +36,19 @@ OUTPUT FORMAT (JSON):
 }
 """
 
-def run_allergen_agent(normalized_data):
+def run_allergen_agent(normalized_data, deadline=None, tier="standard"):
     print(f"   [+ Swarm] 🥜 Allergen Agent analyzing...")
     
     prompt = f"ANALYZE INGREDIENTS: {json.dumps(normalized_data)}"
     
     try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                response_mime_type="application/json",
-                temperature=0.0
-            )
+        config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            response_mime_type="application/json",
+            response_schema=AllergenVerdict,
+            max_output_tokens=512,
+            temperature=0.0
         )
-        return json.loads(response.text)
+        return generate_json(client, "allergen", prompt, config, tier, deadline)
     except Exception as e:
         return {"verdict": "ERROR", "reasoning": str(e)}
\ No newline at end of file
@@ -1,6 +1,16 @@
 import streamlit as st
+import sqlite3
 import time
-from guardian import guardian_orchestrator
+import uuid
+from guardian import guardian_orchestrator, run_product_stages, DEFAULT_DEADLINE_S
+from deadline import Deadline
+import prefetch
+import scratch_space
+import scan_history
+
+# Upload bytes a single session may hold in memory; anything beyond this
+# spills to the bounded scratch area on disk.
+MAX_SESSION_IMAGE_BYTES = 12 * 1024 * 1024
 
 # --- PAGE CONFIG (Mobile Friendly) ---
 st.set_page_config(
@@ -142,11 +152,42 @@ if 'page' not in st.session_state: st.session_state.page = 'onboarding'
 if 'profile' not in st.session_state: 
     st.session_state.profile = {"Celiac": False, "Diabetes": False, "Lactose": False, "Allergies": False}
 if 'scan_input' not in st.session_state: st.session_state.scan_input = None
+if 'prefetch_key' not in st.session_state: st.session_state.prefetch_key = None
+if 'scan_id' not in st.session_state: st.session_state.scan_id = None
+if 'history_pages' not in st.session_state: st.session_state.history_pages = []
+if 'user_id' not in st.session_state:
+    # No accounts yet: a random per-session id. It is never put in the URL, where
+    # anyone the link is shared with could open this user's scans.
+    st.session_state.user_id = uuid.uuid4().hex
 
 # --- NAVIGATION ---
+def release_scan_input():
+    # Drop this session's image buffers and delete any spilled files.
+    scan_input = st.session_state.scan_input
+    if isinstance(scan_input, list):
+        for item in scan_input:
+            scratch_space.release(item)
+    st.session_state.scan_input = None
+
+def drop_prefetch():
+    if st.session_state.prefetch_key:
+        prefetch.discard(st.session_state.prefetch_key)
+    st.session_state.prefetch_key = None
+
 def go_to_scan(): st.session_state.page = 'scan'
 def go_to_results(): st.session_state.page = 'results'
-def go_back(): st.session_state.page = 'scan'
+def go_back():
+    release_scan_input()
+    st.session_state.scan_id = None
+    st.session_state.page = 'scan'
+def go_to_history():
+    st.session_state.history_pages = []
+    st.session_state.page = 'history'
+def open_past_scan(scan_id):
+    drop_prefetch()
+    release_scan_input()
+    st.session_state.scan_id = scan_id
+    st.session_state.page = 'results'
 def toggle_condition(key):
     st.session_state.profile[key] = not st.session_state.profile[key]
 
@@ -222,22 +263,53 @@ elif st.session_state.page == 'scan':
     # Dynamic "Active Profile" tags
     active_conditions = [k for k,v in st.session_state.profile.items() if v]
     st.markdown(f"<small>🛡️ Protection Active: {', '.join(active_conditions)}</small>", unsafe_allow_html=True)
+    st.button("🕘 My Scans", on_click=go_to_history)
 
     t1, t2 = st.tabs(["📸 Camera/Upload", "🔗 Paste Link"])
     
     with t1:
-        img = st.file_uploader("Upload Back Label", type=['jpg','png','jpeg'])
-        if img:
-            st.image(img, width=150)
+        imgs = st.file_uploader("Upload Back Label (add more photos if the list wraps around)",
+                                type=['jpg','png','jpeg'], accept_multiple_files=True)
+        if not imgs:
+            drop_prefetch()
+        else:
+            st.image(imgs, width=150)
+            uploads = [img.getvalue() for img in imgs]
+
+            # Start reading the label right away; the click then only claims it.
+            key = prefetch.image_key(uploads)
+            if key != st.session_state.prefetch_key:
+                drop_prefetch()
+                if sum(len(data) for data in uploads) <= MAX_SESSION_IMAGE_BYTES:
+                    prefetch.start(key, run_product_stages, [memoryview(data) for data in uploads],
+                                   Deadline(DEFAULT_DEADLINE_S))
+                    st.session_state.prefetch_key = key
+
             if st.button("Analyze Image ✨", use_container_width=True):
-                with open("temp_scan.jpg", "wb") as f: f.write(img.getbuffer())
-                st.session_state.scan_input = "temp_scan.jpg"
-                go_to_results()
-                st.rerun()
+                # Hand the upload bytes straight to the pipeline (no shared temp file).
+                release_scan_input()
+                buffers, held = [], 0
+                try:
+                    for img, data in zip(imgs, uploads):
+                        if held + len(data) <= MAX_SESSION_IMAGE_BYTES:
+                            buffers.append(memoryview(data))
+                            held += len(data)
+                        else:
+                            buffers.append(scratch_space.spill(data, suffix=".png" if img.type == "image/png" else ".jpg"))
+                except scratch_space.ScratchFull:
+                    st.session_state.scan_input = buffers
+                    release_scan_input()
+                    st.error("Too many large photos right now. Please try again with fewer images.")
+                else:
+                    st.session_state.scan_input = buffers
+                    go_to_results()
+                    st.rerun()
 
     with t2:
         url = st.text_input("Product URL (Amazon/Blinkit)")
         if url and st.button("Analyze Link ✨", use_container_width=True):
+            drop_prefetch()
+            release_scan_input()
             st.session_state.scan_input = url
             go_to_results()
             st.rerun()
@@ -245,61 +317,122 @@ elif st.session_state.page == 'scan':
 # =========================================================
 # PAGE 3: RESULTS
 # =========================================================
-elif st.session_state.page == 'results':
+def save_scan(data):
+    # History is a convenience: a storage hiccup must not hide the result.
+    try:
+        return scan_history.record(st.session_state.user_id, data)
+    except sqlite3.Error as e:
+        print(f"History Error: {e}")
+        return None
+
+def show_result(data):
+    final_text = data['final_message']
+    swarm = data.get('swarm_data', {})
+
+    # 1. HERO VERDICT (Theme-Aware)
+    if "UNSAFE" in final_text.upper():
+        st.markdown(f'<div class="hero-danger"><h1>🛑 UNSAFE</h1><p>{final_text}</p></div>', unsafe_allow_html=True)
+    elif "RISK" in final_text.upper():
+        st.markdown(f'<div class="hero-warning"><h1>⚠️ CAUTION</h1><p>{final_text}</p></div>', unsafe_allow_html=True)
+    else:
+        st.markdown(f'<div class="hero-safe"><h1>✅ SAFE TO EAT</h1><p>{final_text}</p></div>', unsafe_allow_html=True)
+
+    if data.get('degraded'):
+        st.caption("⏱️ Quick result: some optional checks were skipped to answer on time.")
+    if data.get('created_at'):
+        st.caption(f"🕘 Scanned {time.strftime('%d %b %Y, %H:%M', time.localtime(data['created_at']))}")
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    # 2. CONDITION BREAKDOWN
+    st.markdown("### 🧬 Impact Analysis")
+
+    # The swarm only ran the checks this user's profile asked for.
+    if 'celiac' in swarm:
+        res = swarm['celiac']
+        icon = "✅" if res.get('verdict') == "SAFE" else "🛑"
+        st.markdown(f"""
+        <div class="bento-box">
+            <strong>{icon} Celiac Report</strong><br>
+            <small>{res.get('reasoning', 'Analysis pending.')}</small>
+        </div>""", unsafe_allow_html=True)
+
+    if 'metabolic' in swarm:
+        res = swarm['metabolic']
+        icon = "✅" if res.get('verdict') == "SAFE" else "⚠️"
+        st.markdown(f"""
+        <div class="bento-box">
+            <strong>{icon} Diabetes Report</strong><br>
+            <small>{res.get('reasoning', 'Analysis pending.')}</small>
+        </div>""", unsafe_allow_html=True)
+
+    # 3. INGREDIENT TAGS (Theme-Aware)
+    st.markdown("### 🧪 Ingredients Detected")
+    ing_html = ""
+    for ing in data['normalized_data']['ingredients']:
+        # Logic: If risky, use risk tag class. Else neutral tag class.
+        tag_class = "tag-risk" if ing.get('risk_flags') else "tag-neutral"
+        ing_html += f"<span class='tag {tag_class}'>{ing['scientific_name']}</span>"
+
+    st.markdown(f'<div class="bento-box">{ing_html}</div>', unsafe_allow_html=True)
+
+if st.session_state.page == 'results':
     st.button("⬅️ Scan Another", on_click=go_back)
-    
-    active_conditions = [k for k,v in st.session_state.profile.items() if v]
-    profile_str = ", ".join(active_conditions)
-    
+
     with st.spinner("🤖 Consulting Dr. Satya..."):
         try:
-            # CALL BACKEND
-            data = guardian_orchestrator(st.session_state.scan_input, profile_str)
-            
-            final_text = data['final_message']
-            swarm = data.get('swarm_data', {})
-            
-            # 1. HERO VERDICT (Theme-Aware)
-            if "UNSAFE" in final_text.upper():
-                st.markdown(f'<div class="hero-danger"><h1>🛑 UNSAFE</h1><p>{final_text}</p></div>', unsafe_allow_html=True)
-            elif "RISK" in final_text.upper():
-                st.markdown(f'<div class="hero-warning"><h1>⚠️ CAUTION</h1><p>{final_text}</p></div>', unsafe_allow_html=True)
+            if st.session_state.scan_id is not None:
+                # Already analyzed (a rerun, or opened from history): no recompute.
+                data = scan_history.get(st.session_state.scan_id, st.session_state.user_id)
+                if data is None:
+                    st.error("This scan is no longer available.")
+                    st.stop()
             else:
-                st.markdown(f'<div class="hero-safe"><h1>✅ SAFE TO EAT</h1><p>{final_text}</p></div>', unsafe_allow_html=True)
-            
-            st.markdown("<br>", unsafe_allow_html=True)
+                active_conditions = [k for k,v in st.session_state.profile.items() if v]
+                profile_str = ", ".join(active_conditions)
 
-            # 2. CONDITION BREAKDOWN
-            st.markdown("### 🧬 Impact Analysis")
-            
-            if st.session_state.profile['Celiac'] and 'celiac' in swarm:
-                res = swarm['celiac']
-                icon = "✅" if res.get('verdict') == "SAFE" else "🛑"
-                st.markdown(f"""
-                <div class="bento-box">
-                    <strong>{icon} Celiac Report</strong><br>
-                    <small>{res.get('reasoning', 'Analysis pending.')}</small>
-                </div>""", unsafe_allow_html=True)
-
-            if st.session_state.profile['Diabetes'] and 'metabolic' in swarm:
-                res = swarm['metabolic']
-                icon = "✅" if res.get('verdict') == "SAFE" else "⚠️"
-                st.markdown(f"""
-                <div class="bento-box">
-                    <strong>{icon} Diabetes Report</strong><br>
-                    <small>{res.get('reasoning', 'Analysis pending.')}</small>
-                </div>""", unsafe_allow_html=True)
-
-            # 3. INGREDIENT TAGS (Theme-Aware)
-            st.markdown("### 🧪 Ingredients Detected")
-            ing_html = ""
-            for ing in data['normalized_data']['ingredients']:
-                # Logic: If risky, use risk tag class. Else neutral tag class.
-                tag_class = "tag-risk" if ing.get('risk_flags') else "tag-neutral"
-                ing_html += f"<span class='tag {tag_class}'>{ing['scientific_name']}</span>"
-            
-            st.markdown(f'<div class="bento-box">{ing_html}</div>', unsafe_allow_html=True)
+                # CALL BACKEND
+                data = guardian_orchestrator(st.session_state.scan_input, profile_str,
+                                             prefetch_key=st.session_state.prefetch_key)
+                st.session_state.prefetch_key = None  # claimed (or gone)
+                st.session_state.scan_id = save_scan(data)
+
+            show_result(data)
 
         except Exception as e:
             st.error(f"Analysis Failed: {str(e)}")
-            st.write("Please check your image or internet connection.")
\ No newline at end of file
+            st.write("Please check your image or internet connection.")
+
+# =========================================================
+# PAGE 4: HISTORY
+# =========================================================
+elif st.session_state.page == 'history':
+    c_back, c_title = st.columns([1,4])
+    with c_back:
+        if st.button("⬅️ Scan"):
+            st.session_state.page = 'scan'
+            st.rerun()
+    with c_title:
+        st.markdown("### My Scans")
+
+    # history_pages holds the cursor (last id seen) of each page we paged past.
+    pages = st.session_state.history_pages
+    rows = scan_history.user_history(st.session_state.user_id, before_id=pages[-1] if pages else None)
+    if not rows:
+        st.info("No scans yet. Results you analyze show up here.")
+
+    icons = {"UNSAFE": "🛑", "CAUTION": "⚠️", "SAFE": "✅"}
+    for row in rows:
+        when = time.strftime('%d %b, %H:%M', time.localtime(row['created_at']))
+        st.button(f"{icons[row['verdict']]} {row['title']} · {when}", key=f"scan_{row['id']}",
+                  on_click=open_past_scan, args=(row['id'],), use_container_width=True)
+
+    c_newer, c_older = st.columns(2)
+    with c_newer:
+        if pages and st.button("⬅️ Newer", use_container_width=True):
+            pages.pop()
+            st.rerun()
+    with c_older:
+        if len(rows) == scan_history.PAGE_SIZE and st.button("Older ➡️", use_container_width=True):
+            pages.append(rows[-1]['id'])
+            st.rerun()
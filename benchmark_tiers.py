@@ -0,0 +1,112 @@
+"""
+Model tiering benchmark: latency, cost and verdict agreement per tier.
+
+Runs a fixed set of ingredient lists (simple -> messy) through the normalizer
+and every specialist on each forced tier (escalation off, so "fast" really is
+fast-only), and "routed" exactly as the Guardian does it: per-stage tier
+picks, safety floors and escalation. Agreement is measured against the strong
+tier's verdicts. Needs a real GEMINI_API_KEY.
+
+    python benchmark_tiers.py
+    python benchmark_tiers.py --repeat 3
+"""
+import argparse
+import time
+
+import model_router
+import schemas
+from model_router import TIERS, TIER_MODELS
+from guardian import normalizer_tier, specialist_tier, swarm_tier
+from normalizer_agent import run_agent as run_normalizer
+from celiac_agent import run_celiac_agent
+from metabolic_agent import run_metabolic_agent
+from allergen_agent import run_allergen_agent
+from additive_agent import run_additive_agent
+
+FIXTURES = [
+    "Sugar, Salt, Rice",
+    "Whole Wheat Atta, Water, Salt",
+    "Besan, Groundnut Oil, Salt, Turmeric, Red Chilli Powder",
+    "Maida, Sugar, Edible Vegetable Oil (Palmolein), Invert Syrup, Milk Solids, Leavening Agents (503(ii), 500(ii)), Salt, Emulsifier (322)",
+    "Rava, Sooji, Hing, Curry Leaves, Sendha Namak, Permitted Colour (INS 102), Spices & Condiments",
+    "Corn Grits, Edible Vegetable Oil, Seasoning (Sugar, Salt, Onion Powder, Tomato Powder, Maltodextrin, "
+    "Flavour Enhancers (E621, E631, E627), Acidity Regulator (E330), Anticaking Agent (E551), Soy Sauce Powder), "
+    "Natural Identical Flavouring Substances, Starch, Khand, मैदा",
+]
+
+SPECIALISTS = {
+    "celiac": run_celiac_agent,
+    "metabolic": run_metabolic_agent,
+    "allergen": run_allergen_agent,
+    "additive": run_additive_agent,
+}
+
+# USD per 1M tokens (input, output). Update when pricing changes.
+PRICES = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+def _cost():
+    total = 0.0
+    for (_, model), row in model_router.USAGE.items():
+        price_in, price_out = PRICES.get(model, (0.0, 0.0))
+        total += (row["input_tokens"] * price_in + row["output_tokens"] * price_out) / 1e6
+    return total
+
+def run_fixture(text, mode):
+    model_router.reset_usage()
+    model_router.ESCALATE = mode == "routed"
+    started = time.perf_counter()
+    if mode == "routed":
+        normalized = run_normalizer(text, tier=normalizer_tier(text))
+        tier = swarm_tier(text, normalized)
+        verdicts = {name: (run(normalized, tier=specialist_tier(name, tier)) or {}).get("verdict")
+                    for name, run in SPECIALISTS.items()}
+    else:
+        normalized = run_normalizer(text, tier=mode)
+        verdicts = {name: (run(normalized, tier=mode) or {}).get("verdict") for name, run in SPECIALISTS.items()}
+    elapsed = time.perf_counter() - started
+    model_router.ESCALATE = True
+    return elapsed, _cost(), verdicts, sum(model_router.ESCALATIONS.values())
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency / cost / agreement per model tier.")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    modes = TIERS + ["routed"]
+    rows = {mode: {"latency": [], "cost": 0.0, "agree": 0, "total": 0, "escalations": 0} for mode in modes}
+
+    for _ in range(args.repeat):
+        for text in FIXTURES:
+            results = {}
+            for mode in modes:
+                results[mode] = run_fixture(text, mode)
+                rows[mode]["latency"].append(results[mode][0])
+                rows[mode]["cost"] += results[mode][1]
+                rows[mode]["escalations"] += results[mode][3]
+            reference = results["strong"][2]
+            for mode in modes:
+                verdicts = results[mode][2]
+                rows[mode]["agree"] += sum(verdicts[k] == reference[k] for k in reference)
+                rows[mode]["total"] += len(reference)
+
+    print("\n📊 Tier benchmark "
+          f"(fast={TIER_MODELS['fast']}, standard={TIER_MODELS['standard']}, strong={TIER_MODELS['strong']})\n")
+    header = f"{'mode':>9} {'mean s':>8} {'max s':>8} {'cost $':>10} {'agree %':>8} {'escal.':>7}"
+    print(header)
+    print("-" * len(header))
+    for mode in modes:
+        row = rows[mode]
+        mean = sum(row["latency"]) / len(row["latency"])
+        print(f"{mode:>9} {mean:>8.2f} {max(row['latency']):>8.2f} {row['cost']:>10.5f} "
+              f"{100 * row['agree'] / row['total']:>8.1f} {row['escalations']:>7}")
+    print("\nRouted normalizer tiers: " + ", ".join(normalizer_tier(t) for t in FIXTURES))
+    print("Specialist tiers are picked per fixture after normalization; celiac/allergen never go below standard.")
+    print(schemas.parse_failure_summary())
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from google import genai
 from google.genai import types
+from model_router import generate_json, uncertain_verdict
+from schemas import CeliacVerdict
 import json
 
 # [1] Setup Client
@@ -35,7 +37,7 @@ OUTPUT FORMAT (JSON):
 }
 """
 
-def run_celiac_agent(normalized_data):
+def run_celiac_agent(normalized_data, deadline=None, tier="standard"):
     print(f"\n--- 🧬 Analyzing for Celiac Risks... ---")
     
     # We feed the agent the clean data from the previous step
@@ -45,23 +47,23 @@ def run_celiac_agent(normalized_data):
     """
     
     try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt_content,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                response_mime_type="application/json",
-                temperature=0.0 # Zero creativity. We want facts only.
-            )
+        config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            response_mime_type="application/json",
+            response_schema=CeliacVerdict,
+            max_output_tokens=512,
+            temperature=0.0 # Zero creativity. We want facts only.
         )
         
         # Parse and Print
-        result = json.loads(response.text)
+        result = generate_json(client, "celiac", prompt_content, config, tier, deadline, needs_escalation=uncertain_verdict)
         print(json.dumps(result, indent=2))
         return result
         
     except Exception as e:
         print(f"Error: {e}")
+        # A timed-out or failed check must still surface as a verdict
+        return {"verdict": "ERROR", "reasoning": str(e)}
 
 # --- TEST ZONE ---
 # Here we simulate the output coming from Agent 1 (The Normalizer)
@@ -0,0 +1,177 @@
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from google.genai import errors, types
+from product_analysis import prompt_version
+
+# --- CONTEXT CACHING ---
+# Every agent sends the same long system instruction on every call. Gemini can
+# hold that prefix server-side: we register it once per (model, prompt version),
+# send only the cache handle afterwards, and extend the handle's TTL before it
+# runs out. Editing a prompt changes its version hash, so the old handle is
+# simply never looked up again and expires on its own.
+#
+# Anything that can't be cached (prompt under the API's minimum size, API
+# error, caching turned off) falls back to sending the instruction inline.
+ENABLED = os.environ.get("SATYA_CONTEXT_CACHE", "1") == "1"
+TTL_S = int(os.environ.get("SATYA_CACHE_TTL_S", 3600))
+REFRESH_BEFORE_S = 300
+# Gemini rejects cached contents below a per-model token minimum. Estimated
+# locally (~4 chars per token) so we don't spend a call to find out.
+MIN_CACHE_TOKENS = int(os.environ.get("SATYA_CACHE_MIN_TOKENS", 1024))
+# After a failed registration, don't retry for this long.
+RETRY_AFTER_S = 600
+
+_handles = {}       # (model, version) -> (cache name, expires_at monotonic)
+_failed = {}        # (model, version) -> monotonic time of failure
+_locks = {}
+_lock = threading.Lock()
+STATS = {"hits": 0, "inline": 0, "registered": 0, "refreshed": 0, "failed": 0}
+
+def _key_lock(key):
+    with _lock:
+        return _locks.setdefault(key, threading.Lock())
+
+def _count(stat):
+    with _lock:
+        STATS[stat] += 1
+
+def _display_name(version):
+    return f"satya-{version}"
+
+def _find_existing(client, model, version):
+    # Another worker process (or a restart) may already have registered it.
+    for cached in client.caches.list():
+        if (cached.display_name == _display_name(version) and (cached.model or "").endswith(model)
+                and cached.expire_time and cached.expire_time > datetime.now(timezone.utc)):
+            remaining = (cached.expire_time - datetime.now(timezone.utc)).total_seconds()
+            return cached.name, time.monotonic() + remaining
+    return None
+
+def _register(client, model, system_instruction, version):
+    found = _find_existing(client, model, version)
+    if found:
+        return found
+    cached = client.caches.create(model=model, config=types.CreateCachedContentConfig(
+        display_name=_display_name(version),
+        system_instruction=system_instruction,
+        ttl=f"{TTL_S}s",
+    ))
+    _count("registered")
+    print(f">> 🗄️  Context cache: registered {version} on {model}")
+    return cached.name, time.monotonic() + TTL_S
+
+def _refresh(client, name):
+    client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{TTL_S}s"))
+    _count("refreshed")
+    return name, time.monotonic() + TTL_S
+
+def _handle(client, model, system_instruction):
+    version = prompt_version(system_instruction)
+    key = (model, version)
+    now = time.monotonic()
+    handle = _handles.get(key)
+    if handle and handle[1] - now > REFRESH_BEFORE_S:
+        return handle[0]
+    if now - _failed.get(key, -RETRY_AFTER_S) < RETRY_AFTER_S:
+        return None
+
+    lock = _key_lock(key)
+    if not lock.acquire(blocking=False):
+        # Someone else is registering/refreshing: use the old handle if it's still alive.
+        return handle[0] if handle and handle[1] > now else None
+    try:
+        if handle and handle[1] > now:
+            _handles[key] = _refresh(client, handle[0])
+        else:
+            _handles[key] = _register(client, model, system_instruction, version)
+        return _handles[key][0]
+    except Exception as e:
+        print(f">> 🗄️  Context cache: falling back to inline prompt ({e})")
+        _count("failed")
+        _handles.pop(key, None)
+        _failed[key] = now
+        return None
+    finally:
+        lock.release()
+
+def apply(client, model, config):
+    """config with its system instruction swapped for a cache handle, when possible."""
+    instruction = config.system_instruction
+    if (not ENABLED or not isinstance(instruction, str) or config.cached_content
+            or len(instruction) / 4 < MIN_CACHE_TOKENS):
+        return config
+    name = _handle(client, model, instruction)
+    if name is None:
+        _count("inline")
+        return config
+    _count("hits")
+    return config.model_copy(update={"system_instruction": None, "cached_content": name})
+
+def is_stale_handle(error):
+    """True if a call failed because its cache handle is gone (expired / deleted / unknown).
+
+    Timeouts, quota errors and the like say nothing about the handle and must not
+    throw it away: re-registering would add a caches.create round trip to the next call.
+    """
+    if isinstance(error, KeyError):  # LocalCaches.get
+        return True
+    if isinstance(error, errors.APIError):
+        text = f"{error.status} {error.message}".lower()
+        return error.code in (400, 403, 404) and "cache" in text
+    return False
+
+def invalidate(config):
+    """A call with this cache handle failed: forget it so the next call re-registers."""
+    with _lock:
+        for key, (name, _) in list(_handles.items()):
+            if name == config.cached_content:
+                _handles.pop(key)
+
+# --- LOCAL STAND-IN ---
+class LocalCaches:
+    """In-memory stand-in for client.caches (create/update/list/delete), for mock clients."""
+
+    def __init__(self):
+        self._entries = {}
+        self.instructions = {}  # cache name -> system instruction it holds
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _expiry(self, config):
+        if config.expire_time:
+            return config.expire_time
+        return datetime.now(timezone.utc) + timedelta(seconds=float(config.ttl.rstrip("s")))
+
+    def create(self, model, config):
+        with self._lock:
+            name = f"cachedContents/local-{next(self._ids)}"
+            self._entries[name] = types.CachedContent(
+                name=name, display_name=config.display_name, model=f"models/{model}",
+                expire_time=self._expiry(config))
+            self.instructions[name] = config.system_instruction
+            return self._entries[name]
+
+    def update(self, name, config):
+        with self._lock:
+            entry = self._entries[name]
+            entry.expire_time = self._expiry(config)
+            return entry
+
+    def list(self):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            return [entry for entry in self._entries.values() if entry.expire_time > now]
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is None or entry.expire_time <= datetime.now(timezone.utc):
+            raise KeyError(f"cached content {name} not found")
+        return entry
+
+    def delete(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+            self.instructions.pop(name, None)
@@ -1,6 +1,8 @@
 # [1] Import the library
 from google import genai
 from google.genai import types
+from model_router import generate_json
+from schemas import CritiqueVerdict
 import json
 import os
 
@@ -38,7 +40,7 @@ Return a JSON object with your verdict.
 }
 """
 
-def run_critique_agent(user_profile, ingredient_data, draft_response):
+def run_critique_agent(user_profile, ingredient_data, draft_response, deadline=None, tier="standard"):
     print(f"\n--- 🩺 Dr. Satya is reviewing the draft for a {user_profile} user... ---")
     
     # We combine all three inputs into one prompt string
@@ -53,19 +55,18 @@ def run_critique_agent(user_profile, ingredient_data, draft_response):
     """
     
     try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=complex_input,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                response_mime_type="application/json",
-                temperature=0.1 # Low temp = strict logic, no creativity
-            )
+        config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            response_mime_type="application/json",
+            response_schema=CritiqueVerdict,
+            max_output_tokens=1024,
+            temperature=0.1 # Low temp = strict logic, no creativity
         )
         
         # Parse and Print
-        result = json.loads(response.text)
+        result = generate_json(client, "critique", complex_input, config, tier, deadline)
         print(json.dumps(result, indent=2))
+        return result
         
     except Exception as e:
         print(f"Error: {e}")
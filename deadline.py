@@ -0,0 +1,31 @@
+import time
+from google.genai import types
+
+# --- LATENCY BUDGET ---
+# One Deadline is created per Guardian run and handed down to every agent.
+# Each model call carries whatever is left of it as its HTTP timeout, so a
+# slow Gemini call can never stall the results page past the overall budget.
+
+class Deadline:
+    def __init__(self, budget_s):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def slice(self, share):
+        # A child deadline for one stage. It can never outlive its parent.
+        return Deadline(self.remaining() * share)
+
+    def http_options(self):
+        # The SDK expects the timeout in milliseconds.
+        return types.HttpOptions(timeout=max(1, int(self.remaining() * 1000)))
+
+
+def http_options(deadline):
+    """Per-call HttpOptions for an optional deadline (None = SDK default)."""
+    return deadline.http_options() if deadline else None
@@ -1,68 +1,252 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 # --- IMPORT THE TEAM ---
 from ingestion_agent import run_ingestion_agent 
 from normalizer_agent import run_agent as run_normalizer
-from celiac_agent import run_celiac_agent
-from metabolic_agent import run_metabolic_agent
-from allergen_agent import run_allergen_agent
-from additive_agent import run_additive_agent
-from trust_agent import run_trust_agent
+import celiac_agent
+import metabolic_agent
+import allergen_agent
+import additive_agent
+from trust_agent import run_trust_agent, build_template_response
 from critique_agent import run_critique_agent
+from deadline import Deadline
+from model_router import at_least, pick_tier, score_complexity
+from product_analysis import ProductRecord, fingerprint, prompt_version, shareable
+import prefetch
 
-def guardian_orchestrator(user_input, user_profile):
-    print(f"\n🛡️  GUARDIAN ACTIVATED for User: {user_profile}")
-    
+# --- THE SWARM ---
+# name -> (agent, prompt version). Verdicts are stored per product and per
+# prompt version, so they're shared across users until the prompt changes.
+SPECIALISTS = {
+    "celiac": (celiac_agent.run_celiac_agent, prompt_version(celiac_agent.system_instruction)),
+    "metabolic": (metabolic_agent.run_metabolic_agent, prompt_version(metabolic_agent.system_instruction)),
+    "allergen": (allergen_agent.run_allergen_agent, prompt_version(allergen_agent.system_instruction)),
+    "additive": (additive_agent.run_additive_agent, prompt_version(additive_agent.system_instruction)),
+}
+
+# Checks where a wrong "SAFE" can hurt someone never run below this tier,
+# whatever the product's complexity score (same rule as the critique).
+SPECIALIST_MIN_TIER = {"celiac": "standard", "allergen": "standard"}
+
+# --- LATENCY BUDGET ---
+# Total wall-clock time one scan may take, split across the stages below.
+# Each stage gets its share of whatever is LEFT, so time saved early rolls forward.
+DEFAULT_DEADLINE_S = 30.0
+STAGE_SHARES = [
+    ("ingestion", 0.30),
+    ("normalization", 0.25),
+    ("swarm", 0.20),
+    ("synthesis", 0.15),
+    ("critique", 0.10),
+]
+
+# How long the results page may wait on a still-running prefetch: the
+# ingestion + normalization share of the budget.
+PREFETCH_WAIT_SHARE = 0.55
+
+# Rough cost of one model round trip per optional stage. When the budget left
+# can't cover them, optional work is dropped in this order:
+#   1. additive check  2. LLM critique  3. free-form synthesis (-> template)
+STAGE_COST_S = {"additive": 3.0, "critique": 4.0, "synthesis": 4.0}
+
+# Recent degradation events, for monitoring dashboards / logs.
+DEGRADATION_EVENTS = deque(maxlen=1000)
+
+# --- ROUTING ---
+# Which model tier each stage runs on. benchmark_tiers.py uses these too, so
+# its "routed" numbers describe what ships.
+def normalizer_tier(ingredients_text, image_quality=None):
+    return pick_tier(score_complexity(ingredients_text, image_quality=image_quality))
+
+def swarm_tier(ingredients_text, normalized_data):
+    return pick_tier(score_complexity(ingredients_text, normalized_data))
+
+def specialist_tier(name, tier):
+    return at_least(tier, SPECIALIST_MIN_TIER.get(name, tier))
+
+def _stage_deadline(deadline, stage):
+    names = [name for name, _ in STAGE_SHARES]
+    later = STAGE_SHARES[names.index(stage):]
+    share = later[0][1] / sum(s for _, s in later)
+    return deadline.slice(share)
+
+def _degrade(events, deadline, stage, action):
+    event = {
+        "stage": stage,
+        "action": action,
+        "remaining_s": round(deadline.remaining(), 2),
+        "at": time.time(),
+    }
+    print(f">> ⏱️  Guardian: Degraded {stage}, {action} ({event['remaining_s']}s left)")
+    events.append(event)
+    DEGRADATION_EVENTS.append(event)
+
+def run_product_stages(user_input, deadline):
+    """
+    Steps 1-2 (ingestion + normalization). They don't depend on the user's
+    profile, so the scan page may run them speculatively before the click.
+    Returns (ingestion_result, normalized_data); normalized_data is None if
+    nothing readable came out of ingestion.
+    """
     # STEP 1: INGESTION
     print(">> 📡 Guardian: Calling Ingestion Agent...")
-    ingestion_result = run_ingestion_agent(user_input)
+    ingestion_result = run_ingestion_agent(user_input, _stage_deadline(deadline, "ingestion"))
     ingredients_text = ingestion_result['content']
-    
+
     # --- CRITICAL SAFETY CHECK ---
     # If vision failed, stop here. Don't waste money analyzing nothing.
     if "ERROR_VISION_FAILED" in ingredients_text or len(ingredients_text) < 5:
+        return ingestion_result, None
+
+    print(f">> 📝 Extracted Data: {ingredients_text[:50]}...")
+
+    # STEP 2: NORMALIZATION
+    # Fused image scans arrive already normalized -- no second round trip.
+    normalized_data = ingestion_result.get('normalized')
+    if normalized_data is None:
+        tier = normalizer_tier(ingredients_text, ingestion_result.get('image_quality'))
+        print(f">> 🧠 Guardian: Normalizing for Indian Context ({tier} tier)...")
+        normalized_data = run_normalizer(ingredients_text, _stage_deadline(deadline, "normalization"), tier)
+    else:
+        print(">> 🧠 Guardian: Already normalized by fused vision call.")
+    return ingestion_result, normalized_data
+
+def guardian_orchestrator(user_input, user_profile, deadline_s=DEFAULT_DEADLINE_S, prefetch_key=None):
+    print(f"\n🛡️  GUARDIAN ACTIVATED for User: {user_profile}")
+    deadline = Deadline(deadline_s)
+    degradations = []
+
+    # STEPS 1-2: use the speculative run started at upload time, if there is one
+    staged = None
+    if prefetch_key:
+        staged = prefetch.claim(prefetch_key, timeout=deadline.remaining() * PREFETCH_WAIT_SHARE)
+    # A prefetch whose normalizer came back empty (e.g. timed out) is no use.
+    if staged is not None and staged[1] is not None and staged[1].get("ingredients"):
+        print(">> 🔮 Guardian: Using prefetched ingestion + normalization.")
+    else:
+        staged = run_product_stages(user_input, deadline)
+    ingestion_result, normalized_data = staged
+    ingredients_text = ingestion_result['content']
+
+    if normalized_data is None:
         return {
             "final_message": "⚠️ Error: The image could not be read. It might be blurry or the AI model is currently unavailable. Please try typing the ingredients manually.",
             "swarm_data": {},
             "normalized_data": {"ingredients": []},
-            "critique_report": None
+            "critique_report": None,
+            "degraded": deadline.expired(),
+            "degradations": degradations
         }
 
-    print(f">> 📝 Extracted Data: {ingredients_text[:50]}...")
+    # Text came through but normalization didn't (timeout / model failure):
+    # an empty list would make every specialist answer SAFE. Flag it instead.
+    if not normalized_data.get("ingredients"):
+        _degrade(degradations, deadline, "normalization", "could not analyze ingredients")
+        return {
+            "final_message": f"⚠️ RISK: We read the label but could not analyze its ingredients for your profile ({user_profile}) in time. Please check the label yourself or try again.",
+            "swarm_data": {},
+            "normalized_data": {"ingredients": []},
+            "critique_report": None,
+            "degraded": True,
+            "degradations": degradations
+        }
 
-    # STEP 2: NORMALIZATION
-    print(">> 🧠 Guardian: Normalizing for Indian Context...")
-    normalized_data = run_normalizer(ingredients_text)
+    # Some photos unreadable: whatever we say below covers only part of the label.
+    images_total = ingestion_result.get("images_total", 0)
+    images_unread = images_total - ingestion_result.get("images_read", images_total)
+    if images_unread:
+        _degrade(degradations, deadline, "ingestion", f"{images_unread} of {images_total} photos unreadable")
 
     # STEP 3: SWARM ATTACK
-    print(">> 🚑 Guardian: Deploying Specialist Swarm...")
+    # Simple products get the fastest model tier, hard ones a stronger one.
+    tier = swarm_tier(ingredients_text, normalized_data)
+    print(f">> 🚑 Guardian: Deploying Specialist Swarm ({tier} tier)...")
     swarm_results = {}
+    swarm_deadline = _stage_deadline(deadline, "swarm")
+    # Verdicts other users already paid for on this exact product are reused.
+    product = ProductRecord(normalized_data) if shareable(normalized_data) else None
+
+    def consult(name):
+        agent, version = SPECIALISTS[name]
+        agent_tier = specialist_tier(name, tier)
+        if product is None:
+            return agent(normalized_data, swarm_deadline, agent_tier)
+        return product.verdict(name, version, lambda: agent(normalized_data, swarm_deadline, agent_tier),
+                               deadline=swarm_deadline)
     
     # Only run agents if relevant to user profile
+    names = []
     if any(k in user_profile for k in ["Celiac", "Gluten", "Wheat"]):
-        swarm_results["celiac"] = run_celiac_agent(normalized_data)
+        names.append("celiac")
         
     if any(k in user_profile for k in ["Diabetes", "BP", "Sugar", "Insulin"]):
-        swarm_results["metabolic"] = run_metabolic_agent(normalized_data)
+        names.append("metabolic")
 
     if any(k in user_profile for k in ["Lactose", "Nut", "Soy", "Allergy", "Allergies"]):
-        swarm_results["allergen"] = run_allergen_agent(normalized_data)
+        names.append("allergen")
         
-    # Always run Additive check
-    swarm_results["additive"] = run_additive_agent(normalized_data)
+    # Always run Additive check -- unless it would push synthesis past the deadline
+    # (a stored verdict costs nothing, so it's always used)
+    if (deadline.remaining() >= sum(STAGE_COST_S.values())
+            or (product is not None and product.cached("additive", SPECIALISTS["additive"][1]) is not None)):
+        names.append("additive")
+    else:
+        _degrade(degradations, deadline, "swarm", "skipped additive check")
+
+    # All specialists in flight at once, so each gets the whole swarm slice
+    # instead of whatever the ones before it left over.
+    if names:
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            futures = [(name, pool.submit(consult, name)) for name in names]
+        swarm_results = {name: future.result() for name, future in futures}
+    for name, result in swarm_results.items():
+        if (result or {}).get("verdict") == "ERROR":
+            _degrade(degradations, deadline, "swarm", f"{name} check failed")
 
     # STEP 4: SYNTHESIS
-    print(">> ✍️  Guardian: Trust Agent is drafting report...")
-    draft_response = run_trust_agent(user_profile, swarm_results)
-    
-    print(">> ⚖️  Guardian: Critique Agent is reviewing...")
-    final_verdict = run_critique_agent(user_profile, normalized_data, draft_response)
+    run_critique = True
+    if deadline.remaining() < STAGE_COST_S["synthesis"] + STAGE_COST_S["critique"]:
+        run_critique = False
+        _degrade(degradations, deadline, "critique", "skipped LLM critique")
+
+    if deadline.remaining() >= STAGE_COST_S["synthesis"]:
+        print(">> ✍️  Guardian: Trust Agent is drafting report...")
+        draft_response = run_trust_agent(user_profile, swarm_results, _stage_deadline(deadline, "synthesis"), tier)
+        if draft_response.startswith("System Error"):
+            _degrade(degradations, deadline, "synthesis", "used templated message")
+            draft_response = build_template_response(user_profile, swarm_results)
+    else:
+        _degrade(degradations, deadline, "synthesis", "used templated message")
+        draft_response = build_template_response(user_profile, swarm_results)
+
+    final_verdict = None
+    if run_critique and deadline.remaining() < STAGE_COST_S["critique"]:
+        run_critique = False
+        _degrade(degradations, deadline, "critique", "skipped LLM critique")
+    if run_critique:
+        print(">> ⚖️  Guardian: Critique Agent is reviewing...")
+        # The safety reviewer never runs below the standard tier.
+        final_verdict = run_critique_agent(user_profile, normalized_data, draft_response,
+                                           _stage_deadline(deadline, "critique"), at_least(tier, "standard"))
+        if final_verdict is None:
+            _degrade(degradations, deadline, "critique", "critique failed, draft shown unreviewed")
     
     display_message = draft_response
     if final_verdict and "improved_response" in final_verdict:
         display_message = final_verdict["improved_response"]
+    if images_unread and "UNSAFE" not in display_message.upper():
+        # Never let a partial read look like a clean bill of health.
+        display_message = (f"⚠️ RISK: Only {images_total - images_unread} of {images_total} photos could be read, "
+                           f"so part of the label was not checked. Please rescan it. {display_message}")
         
     return {
         "final_message": display_message,
         "critique_report": final_verdict,
         "swarm_data": swarm_results,
-        "normalized_data": normalized_data
-    }
\ No newline at end of file
+        "normalized_data": normalized_data,
+        "product_fingerprint": fingerprint(normalized_data) if normalized_data["ingredients"] else None,
+        "degraded": bool(degradations),
+        "degradations": degradations
+    }
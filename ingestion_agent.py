@@ -2,13 +2,27 @@ import os
 import re
 from google import genai
 from google.genai import types
+from model_router import generate, generate_stream, pick_tier, score_complexity, TIERS, MIN_ESCALATION_S
+from normalizer_agent import system_instruction as NORMALIZER_INSTRUCTION, run_agent as run_normalizer
+from lexicon import resolve_item, split_items
+from schemas import NormalizerOutput, parse_response
 from PIL import Image
 import io
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURATION ---
 API_KEY = os.environ.get("GEMINI_API_KEY") 
 client = genai.Client(api_key=API_KEY)
 
+# Fused mode: one vision call returns the normalizer's JSON directly,
+# skipping the separate text -> normalizer round trip for photo scans.
+FUSED_INGESTION = os.environ.get("SATYA_FUSED_INGESTION", "0") == "1"
+
+# Streaming mode: normalize the list in chunks while the vision model is still
+# reading it, instead of waiting for the whole text and normalizing it in one go.
+STREAMING_INGESTION = os.environ.get("SATYA_STREAMING_INGESTION", "0") == "1"
+STREAM_CHUNK_ITEMS = 6
+
 # --- THE VISION BRAIN ---
 VISION_INSTRUCTION = """
 ROLE: Food Label OCR Specialist.
@@ -22,20 +36,61 @@ RULES:
 5. IF UNCLEAR: Return "ERROR: Image too blurry."
 """
 
-def _scan_image(image_input):
+# The system instruction is the normalizer's own (Indian-context rules + JSON
+# schema); this just tells the model to read the label first.
+FUSED_TASK = """
+Find the 'Ingredients List' on this food packaging image (it may be small, curved or on the back).
+Ignore Nutrition Facts, Barcodes and Marketing.
+Treat the ingredient text you read as the INPUT TO ANALYZE and return the JSON object.
+If the image is unreadable, return {"ingredients": []}.
+"""
+
+# Magic numbers for the formats the uploader accepts.
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+]
+
+def _is_buffer(image_input):
+    return isinstance(image_input, (bytes, bytearray, memoryview))
+
+def _as_bytes(image_input):
+    # A memoryview over a whole bytes object hands back that same object (no copy).
+    view = memoryview(image_input)
+    return view.obj if isinstance(view.obj, bytes) and view.nbytes == len(view.obj) else view.tobytes()
+
+def _load_image(image_input):
+    # In-memory uploads go to the model as-is: no temp file, no PIL decode and
+    # re-encode.
+    if _is_buffer(image_input):
+        data = _as_bytes(image_input)
+        for signature, mime_type in IMAGE_SIGNATURES:
+            if data.startswith(signature):
+                return types.Part.from_bytes(data=data, mime_type=mime_type)
+        raise ValueError("Unsupported image format")
+    # File paths and file-like objects
+    return Image.open(image_input)
+
+# Photo quality from resolution alone: PIL only parses the header here.
+GOOD_LABEL_PIXELS = 1_000_000
+
+def _image_quality(image_input):
+    try:
+        source = io.BytesIO(_as_bytes(image_input)) if _is_buffer(image_input) else image_input
+        with Image.open(source) as img:
+            width, height = img.size
+        return min(1.0, width * height / GOOD_LABEL_PIXELS)
+    except Exception:
+        return None
+
+def _scan_image(image_input, deadline=None, tier="standard"):
     print(f"\n--- 👁️ Vision Scanner: Processing Image... ---")
     try:
-        # Load image (Handles both file paths and memory bytes)
-        if isinstance(image_input, str):
-            img = Image.open(image_input)
-        else:
-            img = Image.open(image_input)
-
-        response = client.models.generate_content(
-            model='gemini-2.0-flash', # <--- FIXED: Using stable model
-            contents=[VISION_INSTRUCTION, img],
-            config=types.GenerateContentConfig(temperature=0.1)
-        )
+        # Load image (Handles file paths, file objects and memory buffers)
+        img = _load_image(image_input)
+
+        config = types.GenerateContentConfig(temperature=0.1)
+        response = generate(client, "vision", [VISION_INSTRUCTION, img], config, tier, deadline)
         
         extracted_text = response.text.strip()
         print(f">> Extracted Text: {extracted_text[:50]}...") 
@@ -46,14 +101,221 @@ def _scan_image(image_input):
         # Return a simplified error so Guardian can catch it
         return "ERROR_VISION_FAILED"
 
-def run_ingestion_agent(user_input):
+def _scan_image_fused(image_input, deadline=None, tier="standard"):
+    print(f"\n--- 👁️ Vision Scanner (fused): Processing Image... ---")
+    try:
+        img = _load_image(image_input)
+
+        config = types.GenerateContentConfig(
+            system_instruction=NORMALIZER_INSTRUCTION,
+            response_mime_type="application/json",
+            response_schema=NormalizerOutput,
+            max_output_tokens=8192,
+            temperature=0.1
+        )
+        response = generate(client, "fused_ingestion", [FUSED_TASK, img], config, tier, deadline)
+        data = parse_response(NormalizerOutput, response.text, "fused_ingestion")
+        if data["ingredients"]:
+            return data
+        print(">> Fused result was empty, falling back to two-step")
+
+    except Exception as e:
+        # Includes schema validation failures -> two-step path
+        print(f"Fused Vision Error: {e}")
+    return None
+
+# --- MULTI-IMAGE MERGE ---
+# Labels often wrap around the pack, so each photo holds a fragment of the list
+# (plus maybe a separate "Contains:" panel). Fragments overlap at the photo edges.
+def _item_key(item):
+    return re.sub(r'\W+', ' ', item.lower()).strip()
+
+# A boundary join needs at least this many overlapping characters.
+MIN_CHAR_OVERLAP = 3
+SEPARATORS = (",", ";", ".")
+
+def _item_overlap(merged, items):
+    # Longest run of items ending `merged` that the next photo starts with.
+    for k in range(min(len(merged), len(items)), 0, -1):
+        if [_item_key(i) for i in merged[-k:]] == [_item_key(i) for i in items[:k]]:
+            return k
+    return 0
+
+def _whole_word(last, first, n):
+    # Is the shared text a whole word? ("Cocoa Butter" | "Butter Oil" -> yes)
+    before = last[-n - 1] if n < len(last) else " "
+    after = first[n] if n < len(first) else " "
+    return not before.isalnum() and not after.isalnum()
+
+def _join_cut_item(last, first):
+    """
+    "Edible Vege" | "egetable Oil" -> "Edible Vegetable Oil". Only called when
+    the previous photo ended mid-item; None means they're distinct items.
+    """
+    low_last, low_first = last.lower(), first.lower()
+    # Overlap never covers a whole item ("Salt" | "Salted Peanuts") or a whole
+    # word ("Palm Oil" | "Oil Seeds").
+    for n in range(min(len(last), len(first)) - 1, MIN_CHAR_OVERLAP - 1, -1):
+        if low_last.endswith(low_first[:n]) and not _whole_word(last, first, n):
+            return last + first[n:]
+    # No overlap ("Edible Veg" | "etable Oil"): only if the joined word is one we know.
+    joined = last + first
+    if first[:1].islower() and resolve_item(joined) and not (resolve_item(last) and resolve_item(first)):
+        return joined
+    return None
+
+def merge_fragments(fragments):
+    merged, seen, previous = [], set(), ""
+    for fragment in fragments:
+        items = split_items(fragment)
+        if merged and items:
+            # Photos of a wrapped label overlap: drop the items both show...
+            overlap = _item_overlap(merged, items)
+            items = items[overlap:]
+            # ...or, where the previous photo was cut off mid-item, stitch the halves.
+            cut = not previous.rstrip().endswith(SEPARATORS)
+            joined = _join_cut_item(merged[-1], items[0]) if cut and not overlap and items else None
+            if joined:
+                seen.discard(_item_key(merged.pop()))
+                items = [joined] + items[1:]
+        for item in items:
+            key = _item_key(item)
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(item)
+        previous = fragment
+    return ", ".join(merged)
+
+def _take_complete_items(buffer):
+    # Items followed by a top-level separator are complete; the tail may still grow.
+    depth, cut = 0, -1
+    for i, ch in enumerate(buffer):
+        depth += ch in "(["
+        depth -= ch in ")]"
+        if ch in ",;" and depth <= 0:
+            cut, depth = i, 0
+    if cut < 0:
+        return [], buffer
+    return split_items(buffer[:cut]), buffer[cut + 1:]
+
+def _scan_image_streamed(image_input, deadline=None, tier="standard", quality=None):
+    # Returns (text, normalized). normalized is None if any chunk came back empty,
+    # so the Guardian normalizes the full text the usual way.
+    print(f"\n--- 👁️ Vision Scanner (streaming): Processing Image... ---")
+    pool = ThreadPoolExecutor(max_workers=4)
+    chunks, pending, text, buffer = [], [], "", ""
+
+    def submit(items):
+        # Each chunk is routed by its own text, like the non-streamed normalizer:
+        # the OCR tier only reflects photo quality.
+        text_chunk = ", ".join(items)
+        chunk_tier = pick_tier(score_complexity(text_chunk, image_quality=quality))
+        chunks.append((items, pool.submit(run_normalizer, text_chunk, deadline, chunk_tier)))
+
+    try:
+        img = _load_image(image_input)
+        config = types.GenerateContentConfig(temperature=0.1)
+        for piece in generate_stream(client, "vision", [VISION_INSTRUCTION, img], config, tier, deadline):
+            text += piece
+            buffer += piece
+            if text.lstrip().startswith("ERROR"):
+                continue
+            items, buffer = _take_complete_items(buffer)
+            pending += items
+            if len(pending) >= STREAM_CHUNK_ITEMS:
+                submit(pending)
+                pending = []
+
+        text = text.strip()
+        if text.startswith("ERROR") or not text:
+            return "ERROR_VISION_FAILED", None
+        pending += split_items(buffer)
+        if pending:
+            submit(pending)
+        print(f">> Extracted Text: {text[:50]}... ({len(chunks)} chunks normalized in flight)")
+
+        ingredients = []
+        for items, future in chunks:
+            result = future.result()["ingredients"]
+            if not result:
+                return text, None
+            ingredients += result
+        return text, {"ingredients": ingredients}
+
+    except Exception as e:
+        print(f"Vision Error: {e}")
+        return "ERROR_VISION_FAILED", None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _scan_one(image_input, deadline, fused):
+    # Returns (text, normalized, quality). normalized is None unless the fused call validated.
+    quality = _image_quality(image_input)
+    tier = pick_tier(score_complexity(image_quality=quality))
+    if fused:
+        data = _scan_image_fused(image_input, deadline, tier)
+        if data is not None:
+            return ", ".join(ing["original_term"] for ing in data["ingredients"]), data, quality
+    if STREAMING_INGESTION:
+        text, data = _scan_image_streamed(image_input, deadline, tier, quality)
+        if data is not None:
+            return text, data, quality
+    else:
+        text = _scan_image(image_input, deadline, tier)
+    # Unreadable on this tier: one retry a tier up, if there's time
+    if text.startswith("ERROR") and tier != TIERS[-1] and (deadline is None or deadline.remaining() >= MIN_ESCALATION_S):
+        text = _scan_image(image_input, deadline, TIERS[TIERS.index(tier) + 1])
+    return text, None, quality
+
+def _scan_images(images, deadline=None, fused=False):
+    if not images:
+        return {"type": "PROCESSED_IMAGE", "content": "ERROR_VISION_FAILED", "images_read": 0, "images_total": 0}
+    # One OCR call per photo, all in flight at once: wall time ~ one call.
+    with ThreadPoolExecutor(max_workers=len(images)) as pool:
+        results = list(pool.map(lambda image: _scan_one(image, deadline, fused), images))
+
+    readable = [(text, data) for text, data, _ in results if not text.startswith("ERROR")]
+    print(f">> Read {len(readable)}/{len(images)} images")
+    if not readable:
+        return {"type": "PROCESSED_IMAGE", "content": "ERROR_VISION_FAILED",
+                "images_read": 0, "images_total": len(images)}
+
+    merged_text = merge_fragments([text for text, _ in readable])
+    qualities = [quality for _, _, quality in results if quality is not None]
+    # images_read < images_total: part of the label was never checked.
+    result = {"type": "PROCESSED_IMAGE", "content": merged_text,
+              "image_quality": min(qualities) if qualities else None,
+              "images_read": len(readable), "images_total": len(images)}
+
+    # Only skip the normalizer if EVERY photo came back structured; a mixed
+    # batch is re-normalized as merged text so nothing is lost.
+    if all(data is not None for _, data in readable):
+        ingredients, seen = [], set()
+        for _, data in readable:
+            for ing in data["ingredients"]:
+                key = _item_key(ing["original_term"])
+                if key not in seen:
+                    seen.add(key)
+                    ingredients.append(ing)
+        # An item stitched together across a photo edge has no structured entry yet.
+        stitched = {_item_key(item) for item in split_items(merged_text)} - seen
+        if len(readable) == 1 or not stitched:
+            result["normalized"] = {"ingredients": ingredients}
+    return result
+
+def run_ingestion_agent(user_input, deadline=None, fused=None):
     print(f"\n--- 📡 Ingestion Agent Receiving Input... ---")
 
-    # CASE 1: INPUT IS NOT A STRING (It's a File/Bytes from Streamlit)
+    # CASE 0: SEVERAL PHOTOS OF THE SAME PACK
+    fused = FUSED_INGESTION if fused is None else fused
+    if isinstance(user_input, (list, tuple)):
+        print(f">> Type Detected: {len(user_input)} Images")
+        return _scan_images(user_input, deadline, fused)
+
+    # CASE 1: INPUT IS NOT A STRING (It's a memory buffer / file object from Streamlit)
     if not isinstance(user_input, str):
         print(">> Type Detected: Image File Object")
-        extracted_text = _scan_image(user_input)
-        return {"type": "PROCESSED_IMAGE", "content": extracted_text}
+        return _scan_images([user_input], deadline, fused)
 
     cleaned_input = user_input.strip()
 
@@ -66,8 +328,7 @@ def run_ingestion_agent(user_input):
     # CASE 3: INPUT IS AN IMAGE FILE PATH
     if cleaned_input.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
         print(">> Type Detected: Image File Path")
-        extracted_text = _scan_image(cleaned_input)
-        return {"type": "PROCESSED_IMAGE", "content": extracted_text}
+        return _scan_images([cleaned_input], deadline, fused)
 
     # CASE 4: INPUT IS RAW TEXT
     print(">> Type Detected: Manual Text")
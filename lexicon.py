@@ -0,0 +1,163 @@
+import json
+import os
+import re
+
+# --- REGIONAL INGREDIENT LEXICON ---
+# A curated, versioned table (ingredient_lexicon.json) of regional names,
+# INS/E-numbers and known hidden components. It is compiled once at import
+# into flat lookup tables, so common terms ("Maida", "Hing", "INS 322") are
+# normalized locally and only the leftovers go to the Normalizer LLM.
+LEXICON_PATH = os.environ.get(
+    "SATYA_LEXICON_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingredient_lexicon.json")
+)
+
+LABEL_PREFIX = re.compile(r'^\s*(ingredients|contains)\s*[:\-]\s*', re.IGNORECASE)
+PERCENT = re.compile(r'\(?\s*\d+(?:\.\d+)?\s*%\s*\)?')
+INS_CODE = re.compile(r'(?:e|ins)?\s*[-.]?\s*(\d{3,4})\s*(?:\(\s*([ivx]+)\s*\)|([a-z]))?')
+BRACKETED = re.compile(r'(.+?)\s*\((.+)\)')
+
+def _clean(term):
+    term = PERCENT.sub(" ", term.lower())
+    term = term.replace("&", " and ")
+    term = re.sub(r'\s*-\s*', '-', term)
+    return re.sub(r'\s+', ' ', term).strip(" .;:*")
+
+def _code_key(match):
+    number, roman, letter = match.groups()
+    return number + (f"({roman})" if roman else letter or "")
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    synonyms, codes = {}, {}
+    for entry in data["entries"]:
+        for synonym in entry["synonyms"]:
+            synonyms[_clean(synonym)] = entry
+        for code in entry["ins"]:
+            codes[_code_key(INS_CODE.fullmatch(code))] = entry
+    return (data["version"], synonyms, codes,
+            frozenset(_clean(c) for c in data["additive_classes"]),
+            frozenset(_clean(h) for h in data["generic_heads"]))
+
+VERSION, _SYNONYMS, _CODES, _CLASSES, _GENERIC_HEADS = _load(LEXICON_PATH)
+
+def split_items(text):
+    # Top-level commas/semicolons only: "Emulsifier (E322, E471)" stays one item.
+    items, depth, current = [], 0, ""
+    for ch in LABEL_PREFIX.sub("", text or ""):
+        depth += ch in "(["
+        depth -= ch in ")]"
+        if ch in ",;" and depth <= 0:
+            items.append(current)
+            current, depth = "", 0
+        else:
+            current += ch
+    items.append(current)
+    return [item.strip(" .\n") for item in items if item.strip(" .\n")]
+
+def _lookup_code(term):
+    match = INS_CODE.fullmatch(term)
+    if not match:
+        return None
+    key = _code_key(match)
+    if key in _CODES:
+        return _CODES[key]
+    # "500" on the label, "500(ii)" in the table: fine if it's unambiguous.
+    if key.isdigit():
+        candidates = {id(entry): entry for code, entry in _CODES.items()
+                      if code.startswith(key) and not code[len(key)].isdigit()}
+        if len(candidates) == 1:
+            return next(iter(candidates.values()))
+    return None
+
+def _lookup(term):
+    term = _clean(term)
+    return _SYNONYMS.get(term) or _lookup_code(term)
+
+def _ingredient(original_term, entry):
+    return {
+        "original_term": original_term,
+        "scientific_name": entry["scientific_name"],
+        "risk_flags": list(entry["risk_flags"]),
+        "hidden_components": list(entry["hidden_components"]),
+        "explanation": entry["explanation"],
+    }
+
+def _unique(values):
+    return list(dict.fromkeys(v for v in values if v))
+
+def resolve_item(item):
+    """Normalized ingredient dict for one label item, or None if unknown."""
+    entry = _lookup(item)
+    if entry:
+        return _ingredient(item, entry)
+
+    bracketed = BRACKETED.fullmatch(_clean(item))
+    if not bracketed:
+        return None
+    head, inner = bracketed.groups()
+    parts = [_lookup(part) for part in re.split(r',|\band\b', inner) if part.strip()]
+
+    # "Emulsifier (E322, E471)" -> one additive-class ingredient
+    if head in _CLASSES and parts and all(parts):
+        names = _unique(p["scientific_name"] + (f" (INS {p['ins'][0]})" if p["ins"] else "") for p in parts)
+        return {
+            "original_term": item,
+            "scientific_name": f"{head.title()}: {', '.join(names)}",
+            "risk_flags": _unique(f for p in parts for f in p["risk_flags"]),
+            "hidden_components": _unique(h for p in parts for h in p["hidden_components"]),
+            "explanation": "; ".join(_unique(p["explanation"] for p in parts)),
+        }
+    # Generic head: the bracket names the specific ingredient, either together
+    # with the head ("Flour (Rice)" -> Rice Flour) or alone ("Edible Vegetable
+    # Oil (Palmolein)" -> Palm Oil).
+    if head in _GENERIC_HEADS and len(parts) == 1:
+        specific = _lookup(f"{inner} {head}") or parts[0]
+        if specific:
+            return _ingredient(item, specific)
+    # "Maida (Wheat Flour)": the head is already specific, the bracket only explains it
+    head_entry = _lookup(head)
+    if head_entry:
+        return _ingredient(item, head_entry)
+    return None
+
+def resolve(ingredient_text):
+    """Returns [(item, ingredient-or-None), ...] in label order."""
+    return [(item, resolve_item(item)) for item in split_items(ingredient_text)]
+
+# --- TEST ZONE ---
+# python lexicon.py -- checks the splitter and a table of known resolutions.
+if __name__ == "__main__":
+    SPLITS = [
+        ("Ingredients: Salt, Emulsifier (E322, E471); Sugar.", ["Salt", "Emulsifier (E322, E471)", "Sugar"]),
+        ("Maida, Edible Vegetable Oil [Palmolein, Cottonseed], Hing", ["Maida", "Edible Vegetable Oil [Palmolein, Cottonseed]", "Hing"]),
+        ("", []),
+    ]
+    RESOLUTIONS = [
+        ("Maida", "Refined Wheat Flour"),
+        ("Maida (Wheat Flour)", "Refined Wheat Flour"),
+        ("Wheat Flour (Maida)", "Refined Wheat Flour"),
+        ("Atta", "Whole Wheat Flour"),
+        ("Flour (Rice)", "Rice Flour"),
+        ("Hing (Asafoetida)", "Asafoetida"),
+        ("Edible Vegetable Oil (Palmolein)", "Palm Oil"),
+        ("Oil (Palm)", "Palm Oil"),
+        ("INS 322", "Soy Lecithin"),
+        ("E-471", "Mono- and Diglycerides of Fatty Acids"),
+        ("Emulsifier (E322, E471)", "Emulsifier: Soy Lecithin (INS 322), Mono- and Diglycerides of Fatty Acids (INS 471)"),
+        ("Sugar (Refined)", "Sucrose"),
+        ("Flour (Xyz)", None),
+        ("Xyzzy Blend", None),
+    ]
+    failures = 0
+    for text, expected in SPLITS:
+        got = split_items(text)
+        failures += got != expected
+        print(f"{'✅' if got == expected else '❌'} split {text!r} -> {got}")
+    for item, expected in RESOLUTIONS:
+        got = (resolve_item(item) or {}).get("scientific_name")
+        failures += got != expected
+        print(f"{'✅' if got == expected else '❌'} {item!r} -> {got!r}" + ("" if got == expected else f" (expected {expected!r})"))
+    print(f"\n{failures} failure(s)")
+    raise SystemExit(1 if failures else 0)
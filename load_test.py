@@ -0,0 +1,337 @@
+"""
+Concurrent-session load test for Satya Health.
+
+Simulates N users going onboarding -> scan -> results against a local mock
+Gemini backend (no API key, no cost), at increasing concurrency, and reports
+throughput, latency percentiles and memory per session. Use it to size
+deployments and find where one Streamlit process saturates.
+
+Targets:
+  orchestrator  N threads in ONE process calling guardian_orchestrator, the same
+                way Streamlit runs each session's script on its own thread.
+                This is the saturation model for a single Streamlit process.
+  app           Drives the real app.py pages through streamlit's AppTest. AppTest
+                owns a process-wide runtime, so each concurrent session gets its
+                own worker process; use it for end-to-end per-session cost.
+
+    python load_test.py                                   # full app, image scans
+    python load_test.py --target orchestrator             # guardian only
+    python load_test.py --levels 1,4,16,64 --latency 0.8 --profiles "Celiac:3,Diabetes:2,Celiac+Lactose:1"
+    python load_test.py --target orchestrator --no-sharing   # every session pays for its own verdicts
+
+Shared product verdicts live in memory for the run and every level starts
+cold; scan history goes to a throwaway temp directory. Mock results never
+reach the real product_analysis.db or scan_history.db.
+"""
+import argparse
+import atexit
+import contextlib
+import gc
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# The agent modules build a real genai.Client at import time; it only needs *a* key.
+os.environ.setdefault("GEMINI_API_KEY", "load-test")
+# Must be set before the agent modules (and product_analysis) are imported.
+os.environ["SATYA_PRODUCT_DB"] = ":memory:"
+# app.py records every result; the spawned app workers inherit this directory.
+if "SATYA_LOAD_TEST_DIR" not in os.environ:
+    os.environ["SATYA_LOAD_TEST_DIR"] = tempfile.mkdtemp(prefix="satya-load-")
+    atexit.register(shutil.rmtree, os.environ["SATYA_LOAD_TEST_DIR"], True)
+os.environ["SATYA_HISTORY_DB"] = os.path.join(os.environ["SATYA_LOAD_TEST_DIR"], "scan_history.db")
+
+import additive_agent
+import allergen_agent
+import celiac_agent
+import context_cache
+import critique_agent
+import ingestion_agent
+import metabolic_agent
+import normalizer_agent
+import product_analysis
+import schemas
+import trust_agent
+
+AGENT_MODULES = [additive_agent, allergen_agent, celiac_agent, critique_agent,
+                 ingestion_agent, metabolic_agent, normalizer_agent, trust_agent]
+
+# --- MOCK MODEL BACKEND ---
+# Canned replies keyed by the response schema each agent asks for.
+MOCK_LABEL_TEXT = "Maida, Sugar, Edible Vegetable Oil (Palmolein), Hing, Salt, Emulsifier (E322)"
+MOCK_REPLIES = {
+    "NormalizerOutput": {"ingredients": [
+        {"original_term": "Maida", "scientific_name": "Refined Wheat Flour",
+         "risk_flags": ["Allergen", "High Glycemic Index"], "hidden_components": [], "explanation": "Wheat"},
+        {"original_term": "Sugar", "scientific_name": "Sucrose",
+         "risk_flags": ["High Glycemic Index"], "hidden_components": [], "explanation": "Added sugar"},
+        {"original_term": "Hing", "scientific_name": "Asafoetida",
+         "risk_flags": ["Allergen"], "hidden_components": ["Wheat Flour"], "explanation": "Compounded with wheat"},
+    ]},
+    "CeliacVerdict": {"verdict": "UNSAFE", "flagged_ingredients": ["Maida", "Hing"],
+                      "reasoning": "Contains wheat.", "consumer_message": "Not gluten free."},
+    "MetabolicVerdict": {"verdict": "UNSAFE", "risky_ingredients": ["Sugar", "Maida"],
+                         "reasoning": "High GI.", "diabetes_friendly": False, "hypertension_friendly": True},
+    "AllergenVerdict": {"verdict": "UNSAFE", "detected_allergens": ["Soy"],
+                        "reasoning": "Lecithin (E322).", "contamination_warning": ""},
+    "AdditiveVerdict": {"verdict": "HIGHLY_PROCESSED", "bad_additives": ["Palm Oil"],
+                        "health_impact": "Inflammatory fat."},
+    "CritiqueVerdict": {"status": "APPROVED", "safety_violation": False, "critique_reason": "Correct.",
+                        "improved_response": "🛑 UNSAFE: contains wheat and added sugar."},
+}
+
+class _MockResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+class _MockModels:
+    def __init__(self, latency_s, jitter):
+        self.latency_s = latency_s
+        self.jitter = jitter
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            self.calls += 1
+        if getattr(config, "cached_content", None):
+            self.caches.get(config.cached_content)  # expired / unknown handle fails like the API
+        # Network-bound wait: sleeps release the GIL just like a real HTTP call.
+        time.sleep(max(0.0, random.gauss(self.latency_s, self.latency_s * self.jitter)))
+        schema = getattr(config, "response_schema", None)
+        if schema is not None:
+            return _MockResponse(json.dumps(MOCK_REPLIES[schema.__name__]))
+        if isinstance(contents, list):
+            return _MockResponse(MOCK_LABEL_TEXT)  # vision OCR
+        return _MockResponse("🛑 UNSAFE: contains wheat and added sugar.")  # trust draft
+
+    def generate_content_stream(self, model, contents, config=None):
+        # Same reply as generate_content, delivered in a few pieces over the same latency.
+        text = self.generate_content(model, contents, config).text
+        size = max(1, len(text) // 4)
+        for i in range(0, len(text), size):
+            yield _MockResponse(text[i:i + size])
+
+class MockClient:
+    def __init__(self, latency_s=0.5, jitter=0.2):
+        self.caches = context_cache.LocalCaches()
+        self.models = _MockModels(latency_s, jitter)
+        self.models.caches = self.caches
+
+def install_mock_backend(latency_s, jitter):
+    client = MockClient(latency_s, jitter)
+    for module in AGENT_MODULES:
+        module.client = client
+    return client
+
+# --- SESSION SIMULATION ---
+PROFILE_CARDS = {"Celiac": "btn_celiac", "Diabetes": "btn_diabetes",
+                 "Lactose": "btn_lactose", "Allergies": "btn_allergy"}
+
+def parse_profile_mix(spec):
+    # "Celiac:3,Diabetes+Lactose:1" -> [(["Celiac"], 3.0), (["Diabetes", "Lactose"], 1.0)]
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition(":")
+        conditions = [c.strip() for c in name.split("+")]
+        unknown = [c for c in conditions if c not in PROFILE_CARDS]
+        if unknown:
+            raise SystemExit(f"Unknown condition(s) {unknown}; choose from {list(PROFILE_CARDS)}")
+        mix.append((conditions, float(weight or 1)))
+    return mix
+
+def _label_image():
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), "white").save(buf, format="JPEG")
+    return buf.getvalue()
+
+def _click(at, label):
+    next(b for b in at.button if b.label == label).click().run()
+
+def run_app_session(conditions, scan_input, label_jpeg, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file("app.py", default_timeout=timeout)
+    # PAGE 1: ONBOARDING
+    at.run()
+    for condition in conditions:
+        at.button(key=PROFILE_CARDS[condition]).click().run()
+    _click(at, "Continue to Scanner ➡️")
+    # PAGE 2: SCAN
+    if scan_input == "image":
+        at.file_uploader[0].set_value(("label.jpg", label_jpeg, "image/jpeg")).run()
+        started = time.perf_counter()
+        _click(at, "Analyze Image ✨")
+    else:
+        at.text_input[0].input("https://www.amazon.in/dp/B000TEST").run()
+        started = time.perf_counter()
+        _click(at, "Analyze Link ✨")
+    # PAGE 3: RESULTS (rendered inside the same run after st.rerun)
+    elapsed = time.perf_counter() - started
+    if at.exception or at.error:
+        raise RuntimeError((at.exception or at.error)[0].value)
+    return elapsed
+
+def run_orchestrator_session(conditions, scan_input, label_jpeg, timeout):
+    from guardian import guardian_orchestrator
+
+    user_input = [memoryview(label_jpeg)] if scan_input == "image" else MOCK_LABEL_TEXT
+    started = time.perf_counter()
+    guardian_orchestrator(user_input, ", ".join(conditions), deadline_s=timeout)
+    return time.perf_counter() - started
+
+# --- LOAD LEVELS ---
+def _percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _init_app_worker(latency_s, jitter, seed):
+    random.seed(seed + os.getpid())
+    install_mock_backend(latency_s, jitter)
+    tracemalloc.start()
+
+def _warm_app_worker(_):
+    # Keeps process start-up (imports, spawn) out of the measured window.
+    time.sleep(0.2)
+
+def _app_worker_session(conditions, scan_input, label_jpeg, timeout):
+    # Runs inside a worker process: returns (elapsed, peak bytes, error).
+    gc.collect()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = run_app_session(conditions, scan_input, label_jpeg, timeout)
+        return elapsed, tracemalloc.get_traced_memory()[1] - before, None
+    except Exception as e:
+        return None, 0, repr(e)
+
+def run_level(concurrency, sessions, mix, args, label_jpeg):
+    weights = [w for _, w in mix]
+    profiles = [random.choices(mix, weights)[0][0] for _ in range(sessions)]
+    latencies, errors, session_bytes = [], [], []
+    lock = threading.Lock()
+    peak = {"bytes": 0}
+
+    def one(conditions):
+        try:
+            elapsed = run_orchestrator_session(conditions, args.input, label_jpeg, args.timeout)
+            with lock:
+                latencies.append(elapsed)
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+        finally:
+            with lock:
+                peak["bytes"] = max(peak["bytes"], tracemalloc.get_traced_memory()[0])
+
+    product_analysis.reset()  # app workers are fresh processes, so cold already
+    gc.collect()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    if args.target == "orchestrator":
+        with ThreadPoolExecutor(max_workers=concurrency) as pool, \
+                contextlib.redirect_stdout(io.StringIO()):
+            list(pool.map(one, profiles))
+        # Memory held while `concurrency` sessions were alive at once.
+        session_bytes.append(max(0, peak["bytes"] - baseline) / concurrency)
+    else:
+        # Workers are referenced through the module, not __main__: AppTest swaps
+        # __main__ for app.py while it runs, which would break unpickling.
+        import load_test as worker
+        # spawn, not fork: the parent already has threads and tracemalloc running.
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=worker._init_app_worker,
+                                 initargs=(args.latency, args.jitter, args.seed)) as pool:
+            list(pool.map(worker._warm_app_worker, range(concurrency)))
+            started = time.perf_counter()
+            futures = [pool.submit(worker._app_worker_session, conditions, args.input, label_jpeg, args.timeout)
+                       for conditions in profiles]
+            for future in futures:
+                elapsed, used, error = future.result()
+                if error:
+                    errors.append(error)
+                else:
+                    latencies.append(elapsed)
+                    session_bytes.append(used)
+    wall = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "errors": len(errors),
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "mem_per_session_kb": max(session_bytes, default=0) / 1024,
+        "first_error": errors[0] if errors else "",
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test (mock model backend).")
+    parser.add_argument("--target", choices=["app", "orchestrator"], default="app")
+    parser.add_argument("--input", choices=["image", "link"], default="image")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--sessions-per-level", type=int, default=0,
+                        help="sessions per level (default: 4x concurrency)")
+    parser.add_argument("--profiles", default="Celiac:3,Diabetes:3,Celiac+Lactose:2,Allergies:1,Diabetes+Allergies:1")
+    parser.add_argument("--latency", type=float, default=0.5, help="mean mock model latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency std-dev as a fraction of the mean")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-session timeout, seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-sharing", action="store_true",
+                        help="don't reuse specialist verdicts across sessions (cold path)")
+    args = parser.parse_args()
+    if args.no_sharing:
+        os.environ["SATYA_SHARE_VERDICTS"] = "0"  # inherited by app worker processes
+        product_analysis.SHARING = False
+
+    random.seed(args.seed)
+    mix = parse_profile_mix(args.profiles)
+    client = install_mock_backend(args.latency, args.jitter)
+    label_jpeg = _label_image()
+
+    tracemalloc.start()
+    print(f"\n🧪 Load test: target={args.target} input={args.input} mock latency={args.latency}s "
+          f"verdict sharing={'off' if args.no_sharing else 'on'}\n")
+    header = f"{'conc':>5} {'sess':>5} {'err':>4} {'sess/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'KB/sess':>9}"
+    print(header)
+    print("-" * len(header))
+    results = []
+    for concurrency in [int(c) for c in args.levels.split(",")]:
+        sessions = args.sessions_per_level or concurrency * 4
+        row = run_level(concurrency, sessions, mix, args, label_jpeg)
+        results.append(row)
+        print(f"{row['concurrency']:>5} {row['sessions']:>5} {row['errors']:>4} {row['throughput']:>8.2f} "
+              f"{row['p50']:>7.2f} {row['p95']:>7.2f} {row['p99']:>7.2f} {row['mem_per_session_kb']:>9.0f}")
+        if row["first_error"]:
+            print(f"      first error: {row['first_error'][:120]}")
+    tracemalloc.stop()
+
+    # Saturation: first level where adding sessions stops adding throughput.
+    for prev, row in zip(results, results[1:]):
+        if row["throughput"] < prev["throughput"] * 1.1:
+            print(f"\n⚠️  Throughput flattens at ~{prev['concurrency']} concurrent sessions "
+                  f"({prev['throughput']:.2f} sessions/s).")
+            break
+    else:
+        print("\n✅ No saturation within the tested levels.")
+    if args.target == "orchestrator":
+        print(f"Mock model calls: {client.models.calls}")
+        print(schemas.parse_failure_summary())
+
+if __name__ == "__main__":
+    main()
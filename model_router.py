@@ -0,0 +1,169 @@
+import os
+import re
+import threading
+import time
+import context_cache
+from deadline import http_options
+from lexicon import split_items
+from schemas import parse_response
+
+# --- MODEL TIERS ---
+# Simple products go to the fastest model; hard ones (long lists, E-codes,
+# regional names, bad photos) go straight to a stronger one.
+TIERS = ["fast", "standard", "strong"]
+TIER_MODELS = {
+    "fast": os.environ.get("SATYA_MODEL_FAST", "gemini-2.0-flash-lite"),
+    "standard": os.environ.get("SATYA_MODEL_STANDARD", "gemini-2.0-flash"),
+    "strong": os.environ.get("SATYA_MODEL_STRONG", "gemini-2.5-flash"),
+}
+# Complexity score -> tier cut-offs
+FAST_MAX_SCORE = float(os.environ.get("SATYA_FAST_MAX_SCORE", 2.5))
+STANDARD_MAX_SCORE = float(os.environ.get("SATYA_STANDARD_MAX_SCORE", 7.0))
+
+# Don't start an escalation retry with less time than this left.
+MIN_ESCALATION_S = 2.0
+# Off: every call stays on the tier it was given (benchmark_tiers.py pins tiers this way).
+ESCALATE = True
+
+# --- COMPLEXITY SIGNALS ---
+E_CODE = re.compile(r'\b(?:E|INS)\s?-?\s?\d{3,4}[a-z]?\b', re.IGNORECASE)
+NON_LATIN = re.compile(r'[^\x00-\x7f]')
+AMBIGUOUS_TERMS = (
+    "edible vegetable oil", "vegetable fat", "starch", "flavour", "flavor", "spices",
+    "permitted", "emulsifier", "stabiliser", "stabilizer", "colour", "color",
+    "hing", "asafoetida", "masala", "seasoning", "protein",
+)
+
+def score_complexity(ingredients_text="", normalized_data=None, image_quality=None):
+    """Cheap, local estimate of how hard this product is to analyze."""
+    items = split_items(ingredients_text)
+    if normalized_data and normalized_data.get("ingredients"):
+        count = len(normalized_data["ingredients"])
+        unknown = sum(1 for ing in normalized_data["ingredients"] if _unresolved(ing))
+    else:
+        count = len(items)
+        # Regional script the model has to translate
+        unknown = sum(1 for item in items if NON_LATIN.search(item))
+    lowered = (ingredients_text or "").lower()
+    ambiguous = sum(lowered.count(term) for term in AMBIGUOUS_TERMS)
+    e_codes = len(E_CODE.findall(ingredients_text or ""))
+
+    score = count / 8 + unknown + 0.5 * ambiguous + 0.5 * e_codes
+    if image_quality is not None:
+        score += 4 * (1 - image_quality)
+    return round(score, 2)
+
+def pick_tier(score):
+    if score <= FAST_MAX_SCORE:
+        return "fast"
+    if score <= STANDARD_MAX_SCORE:
+        return "standard"
+    return "strong"
+
+def at_least(tier, floor):
+    return TIERS[max(TIERS.index(tier), TIERS.index(floor))]
+
+def _unresolved(ing):
+    name = (ing.get("scientific_name") or "").strip().lower()
+    return not name or "unknown" in name
+
+def unresolved_ingredients(result):
+    """Escalation check for the normalizer: did any term fail to resolve?"""
+    return any(_unresolved(ing) for ing in result.get("ingredients", []))
+
+# Verdicts a specialist uses when it isn't sure: worth a second look one tier up.
+UNCERTAIN_VERDICTS = ("RISKY_NEEDS_VERIFICATION", "MODERATE_RISK")
+
+def uncertain_verdict(result):
+    """Escalation check for the specialists: a hedged verdict is low-confidence."""
+    return result.get("verdict") in UNCERTAIN_VERDICTS
+
+# --- USAGE METRICS ---
+# Per (agent, model): calls, tokens, latency. Read by benchmark_tiers.py.
+USAGE = {}
+ESCALATIONS = {}    # agent -> tier-up retries
+_usage_lock = threading.Lock()
+
+def _record_usage(agent, model, response, elapsed):
+    meta = getattr(response, "usage_metadata", None)
+    with _usage_lock:
+        row = USAGE.setdefault((agent, model), {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "seconds": 0.0})
+        row["calls"] += 1
+        row["seconds"] += elapsed
+        row["input_tokens"] += getattr(meta, "prompt_token_count", None) or 0
+        row["cached_tokens"] += getattr(meta, "cached_content_token_count", None) or 0
+        row["output_tokens"] += getattr(meta, "candidates_token_count", None) or 0
+
+def reset_usage():
+    with _usage_lock:
+        USAGE.clear()
+        ESCALATIONS.clear()
+
+# --- TIERED CALLS ---
+def _drop_cache_handle(config, sent, error):
+    # The handle expired or was deleted server-side: re-register next time.
+    if (sent.cached_content and sent.cached_content != config.cached_content
+            and context_cache.is_stale_handle(error)):
+        context_cache.invalidate(sent)
+
+def generate(client, agent, contents, config, tier="standard", deadline=None):
+    """One generate_content call on the model for `tier`, with usage recorded."""
+    model = TIER_MODELS[tier]
+    started = time.perf_counter()
+    sent = context_cache.apply(client, model, config)
+    try:
+        response = client.models.generate_content(
+            model=model,
+            contents=contents,
+            config=sent.model_copy(update={"http_options": http_options(deadline)}),
+        )
+    except Exception as e:
+        _drop_cache_handle(config, sent, e)
+        raise
+    _record_usage(agent, model, response, time.perf_counter() - started)
+    return response
+
+def generate_stream(client, agent, contents, config, tier="standard", deadline=None):
+    """Streaming variant of generate(): yields text as the model produces it."""
+    model = TIER_MODELS[tier]
+    started, last = time.perf_counter(), None
+    sent = context_cache.apply(client, model, config)
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=sent.model_copy(update={"http_options": http_options(deadline)}),
+        ):
+            last = chunk
+            yield chunk.text or ""
+    except Exception as e:
+        _drop_cache_handle(config, sent, e)
+        raise
+    # Token counts arrive on the final chunk
+    _record_usage(agent, model, last, time.perf_counter() - started)
+
+def generate_json(client, agent, contents, config, tier="standard", deadline=None, needs_escalation=None):
+    """
+    Call the model for `tier` and validate against config.response_schema.
+    On a validation failure (or when `needs_escalation(result)` says the answer
+    is low-confidence) retry one tier up, while the deadline allows.
+    """
+    last_error, result = None, None
+    for current in (TIERS[TIERS.index(tier):] if ESCALATE else [tier]):
+        if current != tier and deadline and deadline.remaining() < MIN_ESCALATION_S:
+            break
+        if current != tier:
+            print(f">> ⬆️  {agent}: escalating to {current} tier")
+            with _usage_lock:
+                ESCALATIONS[agent] = ESCALATIONS.get(agent, 0) + 1
+        try:
+            response = generate(client, agent, contents, config, current, deadline)
+            result = parse_response(config.response_schema, response.text, agent)
+        except Exception as e:
+            last_error = e
+            continue
+        if needs_escalation is None or not needs_escalation(result):
+            return result
+    if result is not None:
+        return result  # best low-confidence answer beats none
+    raise last_error
@@ -1,8 +1,12 @@
 # [1] Import the library
 from google import genai
 from google.genai import types
+from model_router import generate_json, unresolved_ingredients
+from schemas import NormalizerOutput
+import lexicon
 import json
 import os
+import re
 
 # --- CONFIGURATION ---
 API_KEY = os.environ.get("GEMINI_API_KEY") 
@@ -51,25 +55,94 @@ Return ONLY a JSON object. Do not speak to the user.
 }
 """
 
-def run_agent(ingredient_text):
+def _term_key(term):
+    return re.sub(r'\W+', ' ', term.lower()).strip()
+
+def _answers_for(item, pending):
+    # The model's entries for one label item: same term, or a piece of it
+    # ("Salt & Pepper" -> "Salt", "Pepper") / a longer form of it, word for word.
+    key = _term_key(item)
+    exact = [ing for ing in pending if _term_key(ing.get("original_term", "")) == key]
+    if exact:
+        return exact
+    words = set(key.split())
+    return [ing for ing in pending
+            if _term_key(ing.get("original_term", "")) and
+            (set(_term_key(ing["original_term"]).split()) <= words or words <= set(_term_key(ing["original_term"]).split()))]
+
+def _merge(slots, llm_ingredients):
+    # Put the model's answers back where the unknown terms sat on the label.
+    # Match by term first (the model may split, merge or skip terms), then pair
+    # what's left by position (translated names); a label item the model
+    # skipped becomes Unverified instead of disappearing.
+    pending = list(llm_ingredients)
+    answers, unmatched = {}, []
+    for index, (item, ing) in enumerate(slots):
+        if ing is not None:
+            continue
+        found = _answers_for(item, pending)
+        if found:
+            pending = [p for p in pending if not any(p is f for f in found)]
+            answers[index] = found
+        else:
+            unmatched.append(index)
+    if len(unmatched) == len(pending):
+        answers.update({index: [ing] for index, ing in zip(unmatched, pending)})
+        pending = []
+
+    merged = []
+    for index, (item, ing) in enumerate(slots):
+        if ing is not None:
+            merged.append(ing)
+        elif index in answers:
+            merged.extend(answers[index])
+        else:
+            print(f">> ⚠️  Normalizer: no answer for '{item}', marking it Unverified")
+            merged.append(_unverified(item))
+    return merged + pending
+
+def _unverified(term):
+    return {
+        "original_term": term,
+        "scientific_name": term,
+        "risk_flags": ["Unverified"],
+        "hidden_components": [],
+        "explanation": "Could not be analyzed. Please check this ingredient yourself."
+    }
+
+def run_agent(ingredient_text, deadline=None, tier="standard"):
     # print(f"\n--- 🕵️‍♂️ Scanning: {ingredient_text} ---") # Optional logging
-    
+
+    # Known regional names / INS codes are resolved locally from the lexicon.
+    slots = lexicon.resolve(ingredient_text)
+    unknown = [item for item, ing in slots if ing is None]
+    if not unknown:
+        print(f">> 📖 Normalizer: all {len(slots)} terms found in lexicon v{lexicon.VERSION}, no model call")
+        return {"ingredients": [ing for _, ing in slots]}
+
+    # Only the leftovers go to the model
+    prompt = f"INPUT TO ANALYZE: {', '.join(unknown)}"
+
     try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash', # Using Stable Model
-            contents=f"INPUT TO ANALYZE: {ingredient_text}",
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                response_mime_type="application/json"
-            )
+        config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            response_mime_type="application/json",
+            response_schema=NormalizerOutput,
+            max_output_tokens=8192
         )
         
-        return json.loads(response.text) 
+        # Unresolved terms are a low-confidence answer: retry one tier up
+        result = generate_json(client, "normalizer", prompt, config, tier, deadline,
+                               needs_escalation=unresolved_ingredients)
+        return {"ingredients": _merge(slots, result["ingredients"] or [_unverified(term) for term in unknown])}
         
     except Exception as e:
         print(f"Normalizer Error: {e}")
-        # Return a safe fallback so the app doesn't crash
-        return {"ingredients": []} 
+        if len(unknown) == len(slots):
+            # Return a safe fallback so the app doesn't crash
+            return {"ingredients": []}
+        # Keep what the lexicon resolved; never silently drop the rest
+        return {"ingredients": _merge(slots, [_unverified(term) for term in unknown])}
 
 # --- TEST ZONE ---
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- SPECULATIVE PREFETCH ---
+# The scan page starts the profile-independent stages (vision + normalization)
+# as soon as a label is uploaded, while the user is still looking at the
+# preview. The results page then claims the finished work by image hash.
+# Work nobody claims is dropped after a while or when a new upload replaces it.
+MAX_WORKERS = 4
+MAX_JOBS = 32
+TTL_S = 300
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+_jobs = OrderedDict()   # key -> (future, started_at)
+_lock = threading.Lock()
+
+def image_key(buffers):
+    """Content hash of the uploaded images, in upload order."""
+    digest = hashlib.sha256()
+    for buf in buffers:
+        digest.update(buf)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _evict(now):
+    for key in [k for k, (_, started) in _jobs.items() if now - started > TTL_S]:
+        _jobs.pop(key)[0].cancel()
+    while len(_jobs) >= MAX_JOBS:
+        _jobs.popitem(last=False)[1][0].cancel()
+
+def start(key, fn, *args):
+    """Run fn(*args) in the background under `key`, unless it's already running."""
+    with _lock:
+        now = time.monotonic()
+        _evict(now)
+        if key not in _jobs:
+            print(f">> 🔮 Prefetch: starting speculative scan {key[:8]}")
+            _jobs[key] = (_pool.submit(fn, *args), now)
+
+def discard(key):
+    with _lock:
+        job = _jobs.pop(key, None)
+    if job:
+        job[0].cancel()
+
+def claim(key, timeout):
+    """Result of the speculative run for `key`, or None if there is none / it failed."""
+    with _lock:
+        job = _jobs.pop(key, None)
+    if job is None:
+        return None
+    future = job[0]
+    if not (future.running() or future.done()):
+        # Still queued behind other uploads: waiting would only eat this
+        # scan's budget before it even starts. Run it inline instead.
+        future.cancel()
+        print(">> 🔮 Prefetch: still queued, running normally")
+        return None
+    try:
+        # Still running: waiting for it beats starting over.
+        return job[0].result(timeout=timeout)
+    except Exception as e:
+        print(f">> 🔮 Prefetch: not usable ({e!r}), running normally")
+        job[0].cancel()
+        return None
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- PRODUCT-LEVEL ANALYSIS ---
+# Specialist verdicts depend only on the normalized ingredients, not on who is
+# asking. So they are stored once per product (keyed by a fingerprint of the
+# normalized list) and filled lazily: the first Celiac user pays for the celiac
+# check, every later user of any profile reuses it. Per-user synthesis and
+# critique still run per request.
+PRODUCT_DB_PATH = os.environ.get("SATYA_PRODUCT_DB", "product_analysis.db")
+# Off: every scan computes its own verdicts (e.g. to measure the cold path).
+SHARING = os.environ.get("SATYA_SHARE_VERDICTS", "1") == "1"
+
+_db_lock = threading.Lock()
+_db = None
+_memory = {}            # (fingerprint, specialist, version) -> verdict
+_inflight = {}          # same key -> Lock, so concurrent scans compute once
+_inflight_lock = threading.Lock()
+
+def _conn():
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(PRODUCT_DB_PATH, check_same_thread=False)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("""
+            CREATE TABLE IF NOT EXISTS product_verdicts (
+                fingerprint TEXT NOT NULL,
+                specialist  TEXT NOT NULL,
+                version     TEXT NOT NULL,
+                verdict     TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                PRIMARY KEY (fingerprint, specialist, version)
+            )""")
+    return _db
+
+def prompt_version(system_instruction):
+    # Editing a specialist's prompt makes its old verdicts unreachable.
+    return hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()[:12]
+
+def fingerprint(normalized_data):
+    """Order-independent identity of a normalized ingredient list."""
+    canonical = sorted(
+        (
+            (ing.get("scientific_name") or "").strip().lower(),
+            sorted(h.strip().lower() for h in ing.get("hidden_components", [])),
+            sorted(f.strip().lower() for f in ing.get("risk_flags", [])),
+        )
+        for ing in normalized_data.get("ingredients", [])
+    )
+    return hashlib.sha256(json.dumps(canonical).encode("utf-8")).hexdigest()
+
+def shareable(normalized_data):
+    """
+    Only a fully analyzed list identifies a product. A failed normalization
+    ({"ingredients": []}) would give every such product the same fingerprint,
+    and "Unverified" placeholders mean the verdict rests on guesswork.
+    """
+    ingredients = normalized_data.get("ingredients", [])
+    return SHARING and bool(ingredients) and not any("Unverified" in ing.get("risk_flags", []) for ing in ingredients)
+
+def reset():
+    """Forget every stored verdict (load tests start each level cold)."""
+    with _db_lock:
+        _memory.clear()
+        _conn().execute("DELETE FROM product_verdicts")
+        _conn().commit()
+
+class ProductRecord:
+    def __init__(self, normalized_data):
+        self.fingerprint = fingerprint(normalized_data)
+
+    def cached(self, specialist, version):
+        key = (self.fingerprint, specialist, version)
+        if key in _memory:
+            return _memory[key]
+        with _db_lock:
+            row = _conn().execute(
+                "SELECT verdict FROM product_verdicts WHERE fingerprint=? AND specialist=? AND version=?",
+                key).fetchone()
+        if row:
+            _memory[key] = json.loads(row[0])
+            return _memory[key]
+        return None
+
+    def _store(self, specialist, version, verdict):
+        key = (self.fingerprint, specialist, version)
+        _memory[key] = verdict
+        with _db_lock:
+            _conn().execute("INSERT OR REPLACE INTO product_verdicts VALUES (?, ?, ?, ?, ?)",
+                            key + (json.dumps(verdict), time.time()))
+            _conn().commit()
+
+    def verdict(self, specialist, version, compute, deadline=None):
+        """Stored verdict for this product, computing (once) if missing.
+
+        Waiting on another session's computation is bounded by `deadline`: if it
+        hasn't finished by then we compute our own copy instead of waiting longer.
+        """
+        found = self.cached(specialist, version)
+        if found is not None:
+            print(f"   [= Shared] ♻️  {specialist} verdict reused for product {self.fingerprint[:8]}")
+            return found
+
+        key = (self.fingerprint, specialist, version)
+        with _inflight_lock:
+            lock = _inflight.setdefault(key, threading.Lock())
+        if not lock.acquire(timeout=deadline.remaining() if deadline else -1):
+            print(f"   [= Shared] ⏳ {specialist} still running elsewhere for {self.fingerprint[:8]}, computing locally")
+            return compute()
+        try:
+            # Another session may have finished it while we waited.
+            found = self.cached(specialist, version)
+            if found is not None:
+                return found
+            result = compute()
+            # Failed / timed-out checks are not facts about the product.
+            if result and result.get("verdict") not in (None, "ERROR"):
+                self._store(specialist, version, result)
+        finally:
+            lock.release()
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        return result
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# --- SCAN HISTORY ---
+# Append-only log of every finished scan, so results can be shown again
+# without re-running the swarm and users can page through what they scanned.
+# The full Guardian result is stored as zlib-compressed JSON; the columns next
+# to it are only what the list views and indexes need.
+#
+# Analytics never decode payloads: each insert also bumps a per-day counter of
+# flagged additives in the same transaction, so "most flagged this week" reads
+# 7 days x N additives instead of scanning the whole log.
+#
+# The user's health profile is never stored: a scan is keyed by an opaque
+# user id, and the result itself already says which checks ran.
+HISTORY_DB_PATH = os.environ.get("SATYA_HISTORY_DB", "scan_history.db")
+PAGE_SIZE = 10
+DAY_S = 86400
+
+_db_lock = threading.Lock()
+_db = None
+
+def _conn():
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(HISTORY_DB_PATH, check_same_thread=False, timeout=30)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.executescript("""
+            CREATE TABLE IF NOT EXISTS scans (
+                id          INTEGER PRIMARY KEY,
+                user_id     TEXT NOT NULL,
+                product_fp  TEXT NOT NULL,
+                created_at  INTEGER NOT NULL,
+                verdict     TEXT NOT NULL,
+                title       TEXT NOT NULL,
+                payload     BLOB NOT NULL
+            );
+            -- ids only grow, so (key, id) gives newest-first keyset pagination
+            CREATE INDEX IF NOT EXISTS scans_by_user    ON scans (user_id, id);
+            CREATE INDEX IF NOT EXISTS scans_by_product ON scans (product_fp, id);
+            CREATE INDEX IF NOT EXISTS scans_by_time    ON scans (created_at);
+
+            CREATE TABLE IF NOT EXISTS additive_flags_daily (
+                day       INTEGER NOT NULL,
+                additive  TEXT NOT NULL,
+                flags     INTEGER NOT NULL,
+                PRIMARY KEY (day, additive)
+            ) WITHOUT ROWID;
+        """)
+    return _db
+
+def _encode(obj):
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob))
+
+def verdict_of(final_message):
+    # Same reading of the message as the results banner in app.py.
+    text = final_message.upper()
+    if "UNSAFE" in text:
+        return "UNSAFE"
+    if "RISK" in text:
+        return "CAUTION"
+    return "SAFE"
+
+def _title(normalized_data):
+    names = [ing.get("scientific_name") or ing.get("original_term", "") for ing in normalized_data.get("ingredients", [])]
+    return ", ".join(names[:3]) + (f" +{len(names) - 3} more" if len(names) > 3 else "")
+
+def _row(row):
+    scan_id, user_id, product_fp, created_at, verdict, title = row
+    return {"id": scan_id, "user_id": user_id, "product_fingerprint": product_fp,
+            "created_at": created_at, "verdict": verdict, "title": title}
+
+def record(user_id, result, now=None):
+    """Append one finished Guardian result. Returns the scan id, or None if nothing was analyzed."""
+    if not result.get("product_fingerprint"):
+        return None  # unreadable label: nothing worth showing again
+    now = int(now if now is not None else time.time())
+    additives = (result.get("swarm_data", {}).get("additive") or {}).get("bad_additives") or []
+
+    with _db_lock:
+        db = _conn()
+        with db:
+            cursor = db.execute(
+                "INSERT INTO scans (user_id, product_fp, created_at, verdict, title, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, result["product_fingerprint"], now, verdict_of(result["final_message"]),
+                 _title(result["normalized_data"]), _encode(result)))
+            db.executemany(
+                "INSERT INTO additive_flags_daily VALUES (?, ?, 1) "
+                "ON CONFLICT (day, additive) DO UPDATE SET flags = flags + 1",
+                [(now // DAY_S, name) for name in sorted({a.strip().title() for a in additives if a.strip()})])
+    print(f">> 🗂️  History: saved scan {cursor.lastrowid} for user {user_id[:8]}")
+    return cursor.lastrowid
+
+def get(scan_id, user_id=None):
+    """The stored Guardian result (plus 'id', 'created_at'), or None."""
+    query = "SELECT payload, created_at FROM scans WHERE id = ?"
+    args = (scan_id,)
+    if user_id is not None:
+        query += " AND user_id = ?"
+        args += (user_id,)
+    with _db_lock:
+        row = _conn().execute(query, args).fetchone()
+    if row is None:
+        return None
+    return dict(_decode(row[0]), id=scan_id, created_at=row[1])
+
+def _page(column, value, before_id, limit):
+    query = f"SELECT id, user_id, product_fp, created_at, verdict, title FROM scans WHERE {column} = ?"
+    args = (value,)
+    if before_id is not None:
+        query += " AND id < ?"
+        args += (before_id,)
+    query += " ORDER BY id DESC LIMIT ?"
+    with _db_lock:
+        rows = _conn().execute(query, args + (limit,)).fetchall()
+    return [_row(r) for r in rows]
+
+def user_history(user_id, before_id=None, limit=PAGE_SIZE):
+    """Newest-first summaries. Pass the last id of a page as before_id for the next one."""
+    return _page("user_id", user_id, before_id, limit)
+
+def product_history(fingerprint, before_id=None, limit=PAGE_SIZE):
+    return _page("product_fp", fingerprint, before_id, limit)
+
+def top_flagged_additives(days=7, limit=10, now=None):
+    """[(additive, times flagged), ...] over the last `days` days, most flagged first."""
+    today = int(now if now is not None else time.time()) // DAY_S
+    with _db_lock:
+        return _conn().execute(
+            "SELECT additive, SUM(flags) AS total FROM additive_flags_daily WHERE day > ? "
+            "GROUP BY additive ORDER BY total DESC, additive LIMIT ?",
+            (today - days, limit)).fetchall()
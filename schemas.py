@@ -0,0 +1,88 @@
+import threading
+from typing import List, Literal
+from pydantic import BaseModel, Field
+
+# --- RESPONSE SCHEMAS ---
+# Passed to Gemini as `response_schema` so the model is constrained to this
+# exact shape (enum verdicts, bounded display arrays), and used again on our side to
+# validate the reply. pydantic's JSON decoder parses + validates in one pass.
+
+# No item caps on the normalizer: the SDK sends them to Gemini as max_items,
+# which makes the model truncate -- and a dropped ingredient or "Allergen" flag
+# is a safety bug. Its output is bounded by max_output_tokens only.
+class NormalizedIngredient(BaseModel):
+    original_term: str
+    scientific_name: str
+    risk_flags: List[str] = Field(default_factory=list)
+    hidden_components: List[str] = Field(default_factory=list)
+    explanation: str = ""
+
+class NormalizerOutput(BaseModel):
+    ingredients: List[NormalizedIngredient]
+
+class CeliacVerdict(BaseModel):
+    verdict: Literal["SAFE", "UNSAFE", "RISKY_NEEDS_VERIFICATION"]
+    flagged_ingredients: List[str] = Field(default_factory=list, max_length=20)
+    reasoning: str
+    consumer_message: str
+
+class MetabolicVerdict(BaseModel):
+    verdict: Literal["SAFE", "UNSAFE", "MODERATE_RISK"]
+    risky_ingredients: List[str] = Field(default_factory=list, max_length=20)
+    reasoning: str
+    diabetes_friendly: bool
+    hypertension_friendly: bool
+
+class AllergenVerdict(BaseModel):
+    verdict: Literal["SAFE", "UNSAFE"]
+    detected_allergens: List[str] = Field(default_factory=list, max_length=20)
+    reasoning: str
+    contamination_warning: str
+
+class AdditiveVerdict(BaseModel):
+    verdict: Literal["CLEAN_LABEL", "HIGHLY_PROCESSED"]
+    bad_additives: List[str] = Field(default_factory=list, max_length=20)
+    health_impact: str
+
+class CritiqueVerdict(BaseModel):
+    status: Literal["APPROVED", "REJECTED"]
+    safety_violation: bool
+    critique_reason: str
+    improved_response: str
+
+# --- PARSE METRICS ---
+# Per-agent parse outcomes, so schema drift shows up as a failure rate
+# instead of a trickle of "ERROR" verdicts.
+PARSE_STATS = {}
+_stats_lock = threading.Lock()
+
+def _record(agent, ok):
+    with _stats_lock:
+        stats = PARSE_STATS.setdefault(agent, {"ok": 0, "failed": 0})
+        stats["ok" if ok else "failed"] += 1
+
+def parse_failure_rate(agent=None):
+    with _stats_lock:
+        rows = [PARSE_STATS.get(agent)] if agent else list(PARSE_STATS.values())
+        rows = [r for r in rows if r]
+        total = sum(r["ok"] + r["failed"] for r in rows)
+        return sum(r["failed"] for r in rows) / total if total else 0.0
+
+def parse_failure_summary():
+    """One line for reports: per-agent and overall share of replies that failed validation."""
+    with _stats_lock:
+        agents = sorted(PARSE_STATS)
+    if not agents:
+        return "Parse failures: no replies parsed"
+    per_agent = ", ".join(f"{a} {100 * parse_failure_rate(a):.1f}%" for a in agents)
+    return f"Parse failures: {per_agent} (overall {100 * parse_failure_rate():.1f}%)"
+
+def parse_response(schema, text, agent):
+    """Validate a model reply against `schema`; returns a plain dict for the rest of the pipeline."""
+    try:
+        result = schema.model_validate_json(text).model_dump()
+    except Exception:
+        _record(agent, ok=False)
+        raise
+    _record(agent, ok=True)
+    return result
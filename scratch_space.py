@@ -0,0 +1,53 @@
+import os
+import tempfile
+import threading
+import time
+
+# --- UPLOAD SCRATCH AREA ---
+# Uploads normally stay in memory. Only images beyond a session's memory cap
+# spill here: one uniquely named file each, and the whole area is size-bounded
+# so a burst of large uploads can't fill the disk.
+SCRATCH_DIR = os.environ.get("SATYA_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "satya_scratch"))
+SCRATCH_MAX_BYTES = int(os.environ.get("SATYA_SCRATCH_MAX_BYTES", 256 * 1024 * 1024))
+STALE_AFTER_S = 60 * 60  # abandoned sessions never release their files
+
+_lock = threading.Lock()
+
+class ScratchFull(Exception):
+    pass
+
+def _usage():
+    # Also sweeps stale files, so the bound holds even if sessions vanish.
+    total, now = 0, time.time()
+    for entry in os.scandir(SCRATCH_DIR):
+        try:
+            stat = entry.stat()
+            if now - stat.st_mtime > STALE_AFTER_S:
+                os.remove(entry.path)
+            else:
+                total += stat.st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+def spill(data, suffix=".jpg"):
+    """Write `data` (bytes-like) to a new scratch file and return its path."""
+    with _lock:
+        os.makedirs(SCRATCH_DIR, exist_ok=True)
+        if _usage() + len(data) > SCRATCH_MAX_BYTES:
+            raise ScratchFull(f"Scratch area is full ({SCRATCH_MAX_BYTES} bytes)")
+        fd, path = tempfile.mkstemp(prefix="scan_", suffix=suffix, dir=SCRATCH_DIR)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path
+
+def release(path):
+    """Delete a spilled file. Paths outside the scratch area are left alone."""
+    if not isinstance(path, str):
+        return
+    if os.path.dirname(os.path.abspath(path)) != os.path.abspath(SCRATCH_DIR):
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,5 +1,6 @@
 from google import genai
 from google.genai import types
+from model_router import generate
 import json
 
 # [1] Setup Client
@@ -27,7 +28,7 @@ OUTPUT FORMAT:
 Return a plain text string (the final draft message). Do not return JSON. Write exactly what the user should read.
 """
 
-def run_trust_agent(user_profile, swarm_results):
+def run_trust_agent(user_profile, swarm_results, deadline=None, tier="standard"):
     print(f"\n--- ✍️ Trust Agent is drafting the response... ---")
     
     # We flatten the swarm results into a string for the AI to read
@@ -43,14 +44,12 @@ def run_trust_agent(user_profile, swarm_results):
     """
     
     try:
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=complex_input,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=0.7 # Higher temp allows for better, more natural writing
-            )
+        config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            max_output_tokens=512, # A phone-screen message, not an essay
+            temperature=0.7 # Higher temp allows for better, more natural writing
         )
+        response = generate(client, "trust", complex_input, config, tier, deadline)
         
         print("\n[DRAFT RESPONSE]:")
         print(response.text)
@@ -60,6 +59,37 @@ def run_trust_agent(user_profile, swarm_results):
         print(f"Error: {e}")
         return "System Error: Could not generate response."
 
+# --- FALLBACK: TEMPLATED SYNTHESIS ---
+# Used by the Guardian when the latency budget has no room for a model call.
+# Same "Hierarchy of Safety" as the prompt above, minus the free-form writing.
+UNSAFE_VERDICTS = {"UNSAFE"}
+CAUTION_VERDICTS = {"RISKY_NEEDS_VERIFICATION", "MODERATE_RISK", "HIGHLY_PROCESSED"}
+SAFE_VERDICTS = {"SAFE", "CLEAN_LABEL"}
+
+def build_template_response(user_profile, swarm_results):
+    unsafe, caution, unchecked = [], [], []
+    for specialist, result in swarm_results.items():
+        verdict = (result or {}).get("verdict")
+        if verdict in UNSAFE_VERDICTS:
+            unsafe.append(specialist)
+        elif verdict in CAUTION_VERDICTS:
+            caution.append(specialist)
+        elif verdict not in SAFE_VERDICTS:
+            unchecked.append(specialist)
+
+    # Wording matters: app.py picks the hero banner from "UNSAFE" / "RISK".
+    if unsafe:
+        return (f"🛑 UNSAFE for your profile ({user_profile}). "
+                f"Flagged by: {', '.join(unsafe)}. Please avoid this product.")
+    if caution or unchecked:
+        lines = [f"⚠️ RISK: Please check this product carefully for your profile ({user_profile})."]
+        if caution:
+            lines.append(f"Concerns raised by: {', '.join(caution)}.")
+        if unchecked:
+            lines.append(f"Could not be fully verified: {', '.join(unchecked)}.")
+        return " ".join(lines)
+    return f"✅ No concerns found for your profile ({user_profile})."
+
 # --- TEST ZONE ---
 if __name__ == "__main__":
     # Simulated data from the other agents (Mocking the inputs)